@@ -8,9 +8,8 @@ from nested_inline.admin import NestedModelAdmin, NestedTabularInline
 from nonrelated_inlines.admin import NonrelatedStackedInline
 
 from app.admin.general import admin_site
-from app.card_abilities.card_utils import get_class_card
+from app.card_abilities.registry import CardAbilityRegistry
 from app.enums.card import CardEditions
-from app.exceptions import CardAbilityNotFound
 from app.models.arena import Arena
 from app.models.battle import Battle, BattleLogMongo, EventHistory
 from app.models.card import Card, CardAction, CardRelationShip, CardSeries, CardSubtype
@@ -91,15 +90,9 @@ class CardFilter(admin.SimpleListFilter):
         if self.value() != 'coded_but_disabled':
             return None
 
-        cards_not_is_enabled = queryset.filter(is_enabled=False)
-        list_is_coded_cards = []
-        for card in cards_not_is_enabled:
-            try:
-                get_class_card(card.custom_id)
-                list_is_coded_cards.append(card.custom_id)
-            except CardAbilityNotFound:
-                continue
-        return queryset.filter(custom_id__in=list_is_coded_cards)
+        return queryset.filter(
+            is_enabled=False, custom_id__in=CardAbilityRegistry.coded_custom_ids()
+        )
 
 
 class CardAdmin(NestedModelAdmin):
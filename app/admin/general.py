@@ -19,12 +19,11 @@ from app.models.client_version import ClientVersion
 from app.models.keyword import Keyword
 from app.models.onboarding import Onboarding
 from app.models.trace import Trace
-from app.redis_client import redis_client
+from app.repositories.presence import PresencePlace, PresenceRepository
 from app.tasks import update_global_statistics
 from django_app.settings import (
     AWS_ACCESS_KEY_ID,
     AWS_SECRET_ACCESS_KEY,
-    BATTLE_CONSUMER_REDIS_GROUP_PREFIX,
     CLIENT_VERSION_CONFIG_BUCKET_NAME,
     CLIENT_VERSION_CONFIG_FILE_NAME,
 )
@@ -46,9 +45,8 @@ class MyAdminSite(AdminSite):
         custom_extra_context = {
             'total_players': statistics['players']['all_time'],
             'total_players_online': statistics['players']['online'],
-            'total_players_in_battle': len(
-                redis_client.keys(f'asgi:group:{BATTLE_CONSUMER_REDIS_GROUP_PREFIX}*')
-            ),  # avoids 1 player online and 2 players in battle situation
+            # avoids 1 player online and 2 players in battle situation
+            'total_players_in_battle': PresenceRepository.count(PresencePlace.BATTLE),
         }
         if extra_contex:
             extra_contex.update(custom_extra_context)
@@ -8,3 +8,8 @@ class ApiConfig(AppConfig):
 
     def ready(self):
         import app.models.signals  # noqa:F401  pylint:disable=import-outside-toplevel,unused-import
+        from app.card_abilities.registry import (  # pylint:disable=import-outside-toplevel
+            CardAbilityRegistry,
+        )
+
+        CardAbilityRegistry.build()
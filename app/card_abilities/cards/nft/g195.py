@@ -4,6 +4,7 @@ import app.card_abilities.state
 from app.card_abilities import actions, signatures
 from app.enums.card import CardTypesEnum
 from app.models import battle, card
+from app.services.battle_board import BattleBoard
 
 
 class G195(signatures.Mystery):
@@ -21,10 +22,8 @@ class G195(signatures.Mystery):
         enemy = state.enemy if state.enemy == player else state.player
         signatures.send_mystery_card_activated_event(state, player, active_mystery)
 
-        enemy_serfs: List[battle.Tile] = (
-            enemy.tile.exclude_mia()
-            .exclude(card__isnull=True)
-            .filter(card__type=CardTypesEnum.serf)
+        enemy_serfs: List[battle.Tile] = BattleBoard.for_state(state).tiles(
+            enemy, exclude_mia=True, card_type=CardTypesEnum.serf
         )
         actions.ensnare_tiles(state, tiles=enemy_serfs, turns=1)
         super().disappear(state, active_mystery)
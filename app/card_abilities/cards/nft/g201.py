@@ -2,6 +2,7 @@ import app.card_abilities.state
 from app.card_abilities import signatures
 from app.models import battle
 from app.repositories.base import BaseRepository
+from app.services.battle_board import BattleBoard
 from app.services.tile import TileService
 
 
@@ -11,11 +12,8 @@ class G201(signatures.DigMixin, signatures.Serf):
     """
 
     def after_death(self, state: app.card_abilities.state.State, target: battle.Tile):
-        tile_ids = list(
-            battle.BattlePlayer.objects.get(tile=target).tile.values_list('id', flat=True)
-        )
-        tile_ids = BaseRepository.random_objects(subsequence=tile_ids, count_objects=2)
-        tiles = battle.Tile.objects.filter(id__in=tile_ids)
+        tiles = BattleBoard.for_state(state).tiles(target.player)
+        tiles = BaseRepository.random_objects(subsequence=tiles, count_objects=2) or []
         for tile in tiles:
             TileService.tile_update_element(
                 state=state, tile=tile, new_element=battle.Tile.Elements.EARTH
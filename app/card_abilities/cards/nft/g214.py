@@ -3,6 +3,7 @@ from typing import Union
 from app.card_abilities import signatures
 from app.card_abilities.actions import move_card_from_tile_to_hand
 from app.models import battle
+from app.services.battle_board import BattleBoard
 
 
 class G214(signatures.Spell):
@@ -17,9 +18,10 @@ class G214(signatures.Spell):
         source: Union[battle.CardHand, battle.CardGraveyard],
         target_tile: Union[None, battle.Tile] = None,
     ):
+        board = BattleBoard.for_state(state)
         all_creatures = [
-            *state.enemy.tile.non_free().exclude_mia(),
-            *state.player.tile.non_free().exclude_mia(),
+            *board.tiles(state.enemy, non_free=True, exclude_mia=True),
+            *board.tiles(state.player, non_free=True, exclude_mia=True),
         ]
         for creature in all_creatures:
             move_card_from_tile_to_hand(state=state, tile=creature, hand_player=creature.player)
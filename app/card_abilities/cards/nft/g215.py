@@ -5,6 +5,7 @@ from app.card_abilities import signatures
 from app.enums.card import CardTypesEnum
 from app.models import battle
 from app.repositories.base import BaseRepository
+from app.services.battle_board import BattleBoard
 from app.services.tile import TileService
 
 
@@ -20,9 +21,10 @@ class G215(signatures.Spell):
         source: Union[battle.CardHand, battle.CardGraveyard],
         target_tile: Union[None, battle.Tile] = None,
     ):
+        board = BattleBoard.for_state(state)
         enemy_serfs = [
-            *state.enemy.tile.exclude(card__isnull=True).filter(card__type=CardTypesEnum.serf),
-            *state.player.tile.exclude(card__isnull=True).filter(card__type=CardTypesEnum.serf),
+            *board.tiles(state.enemy, card_type=CardTypesEnum.serf),
+            *board.tiles(state.player, card_type=CardTypesEnum.serf),
         ]
         tiles = BaseRepository.random_objects(subsequence=enemy_serfs, count_objects=2)
         self.spell_attack_tiles(state, damage=3, tiles=tiles)
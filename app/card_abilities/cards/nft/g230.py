@@ -4,6 +4,7 @@ import app.card_abilities.state
 from app.card_abilities import actions, signatures
 from app.enums.card import CardElementsEnum
 from app.models import battle
+from app.services.battle_board import BattleBoard
 
 
 class G230(signatures.DigMixin, signatures.WarcryMixin, signatures.Serf):
@@ -18,9 +19,13 @@ class G230(signatures.DigMixin, signatures.WarcryMixin, signatures.Serf):
         source: Union[battle.CardHand, battle.CardGraveyard],
         target_tile: Optional[battle.Tile] = None,
     ):
-        buff: int = battle.CardHand.objects.filter(
-            player=source.player, card__element=CardElementsEnum.earth
-        ).count()
+        buff: int = len(
+            [
+                hand_card
+                for hand_card in BattleBoard.for_state(state).hand(source.player)
+                if hand_card.card.element == CardElementsEnum.earth
+            ]
+        )
         if buff == 0 or not target_tile:
             return
 
@@ -5,6 +5,7 @@ import app.card_abilities.state
 from app import battle_service
 from app.card_abilities import actions, signatures
 from app.models import battle
+from app.services.battle_board import BattleBoard
 
 
 class G253(signatures.Spell):
@@ -19,13 +20,12 @@ class G253(signatures.Spell):
         source: battle.CardHand,
         target_tile=None,
     ):
+        board = BattleBoard.for_state(state)
         all_creatures = [
-            *state.enemy.tile.non_free().exclude_mia(),
-            *state.player.tile.non_free().exclude_mia(),
-        ]
-        target_creatures = [
-            creature for creature in all_creatures if creature.get_attack_with_enchantments < 4
+            *board.tiles(state.enemy, non_free=True, exclude_mia=True),
+            *board.tiles(state.player, non_free=True, exclude_mia=True),
         ]
+        target_creatures = [creature for creature in all_creatures if board.attack_of(creature) < 4]
         if target_creatures:
             random_target = random.choice(target_creatures)
             card_behavior = battle_service.get_card_behavior(random_target)
@@ -4,6 +4,7 @@ import app.card_abilities.state
 from app.card_abilities import actions, signatures
 from app.enums.card import CardTypesEnum
 from app.models import battle
+from app.services.battle_board import BattleBoard
 
 
 class G261(signatures.Spell):
@@ -19,9 +20,16 @@ class G261(signatures.Spell):
         source: Union[battle.CardHand, battle.CardGraveyard],
         target_tile: Union[None, battle.Tile] = None,
     ):
-        count_water_tiles = state.player.tile.filter(element=battle.Tile.Elements.WATER).count()
-        tiles = state.enemy.tile.exclude(card__isnull=True).filter(card__type=CardTypesEnum.serf)
+        board = BattleBoard.for_state(state)
+        count_water_tiles = len(
+            [
+                tile
+                for tile in board.tiles(state.player)
+                if tile.element == battle.Tile.Elements.WATER
+            ]
+        )
+        tiles = board.tiles(state.enemy, card_type=CardTypesEnum.serf)
 
         for tile in tiles:
-            if tile.get_attack_with_enchantments < count_water_tiles:
+            if board.attack_of(tile) < count_water_tiles:
                 actions.move_card_from_tile_to_hand(state=state, tile=tile, hand_player=state.enemy)
@@ -0,0 +1,98 @@
+import inspect
+from dataclasses import dataclass
+from enum import IntFlag
+from typing import Optional
+
+from app.exceptions import CardAbilityNotFound
+
+
+class CardCapability(IntFlag):
+    NONE = 0
+    ON_FRIENDLY_CREATURE_DEATH = 16
+    ON_ANY_SPELL_CARD_PLAYED = 32
+    ON_PLAY_FRIENDLY_CREATURE_WITH_WARCRY = 64
+    ON_OPPONENT_CREATURE_PLAY = 128
+    ON_PLAYER_AVATAR_DAMAGE = 256
+    ON_AWAKE_FROM_MIA = 512
+
+
+#: Behavior methods that are triggered by other cards, a card reacts only when it overrides them
+LISTENER_CAPABILITIES = {
+    'on_friendly_creature_death': CardCapability.ON_FRIENDLY_CREATURE_DEATH,
+    'on_any_spell_card_played': CardCapability.ON_ANY_SPELL_CARD_PLAYED,
+    'on_play_friendly_creature_with_warcry': CardCapability.ON_PLAY_FRIENDLY_CREATURE_WITH_WARCRY,
+    'on_opponent_creature_play': CardCapability.ON_OPPONENT_CREATURE_PLAY,
+    'on_player_avatar_damage': CardCapability.ON_PLAYER_AVATAR_DAMAGE,
+    'on_awake_from_mia': CardCapability.ON_AWAKE_FROM_MIA,
+}
+
+
+@dataclass(frozen=True)
+class CardAbility:
+    custom_id: str
+    behavior: type
+    capabilities: CardCapability
+
+
+def overrides(behavior: type, method_name: str) -> bool:
+    """True if the method is redefined below the base class that declares it"""
+    owners = [klass for klass in behavior.__mro__ if method_name in vars(klass)]
+    return len(owners) > 1
+
+
+def get_capabilities(behavior: type) -> CardCapability:
+    capabilities = CardCapability.NONE
+    for method_name, capability in LISTENER_CAPABILITIES.items():
+        if overrides(behavior, method_name):
+            capabilities |= capability
+    return capabilities
+
+
+class CardAbilityRegistry:
+    """
+    Coded card abilities by card custom_id.
+
+    Built once on app start from ``app.card_abilities.cards``, so code that only needs to know
+    whether a card is coded or what it can react to doesn't resolve behavior classes.
+    """
+
+    _abilities: Optional[dict[str, CardAbility]] = None
+
+    @classmethod
+    def build(cls) -> None:
+        # pylint: disable=import-outside-toplevel
+        from app.card_abilities import cards
+
+        abilities = {}
+        for custom_id, behavior in vars(cards).items():
+            if inspect.isclass(behavior) and behavior.__module__.startswith(cards.__name__):
+                abilities[custom_id] = CardAbility(
+                    custom_id=custom_id, behavior=behavior, capabilities=get_capabilities(behavior)
+                )
+        cls._abilities = abilities
+
+    @classmethod
+    def abilities(cls) -> dict[str, CardAbility]:
+        if cls._abilities is None:
+            cls.build()
+        return cls._abilities
+
+    @classmethod
+    def get(cls, custom_id: str) -> CardAbility:
+        try:
+            return cls.abilities()[custom_id]
+        except KeyError as exc:
+            raise CardAbilityNotFound(custom_id=custom_id) from exc
+
+    @classmethod
+    def is_coded(cls, custom_id: str) -> bool:
+        return custom_id in cls.abilities()
+
+    @classmethod
+    def coded_custom_ids(cls) -> list[str]:
+        return list(cls.abilities())
+
+    @classmethod
+    def has(cls, custom_id: Optional[str], capability: CardCapability) -> bool:
+        ability = cls.abilities().get(custom_id)
+        return ability is not None and capability in ability.capabilities
@@ -47,5 +47,9 @@ class OpponentSelectedDeckIsNotPlayable(PreparedException):
     message = "The opponent's selected deck is not playable"
 
 
+class BattleStateConflict(PreparedException):
+    message = 'Battle state was changed by another action, try again'
+
+
 class CardAbilityNotFound(PreparedException):
     message = 'Card ability not found'
@@ -0,0 +1,93 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q
+from django.utils import timezone
+
+from app.models.battle import Battle, BattlePlayer
+from app.models.game_mode import PlayerBattleStats
+from app.models.player import Player
+from app.repositories.battle_stats import BattleStatsQueueRepository
+
+
+class Command(BaseCommand):
+    help = 'Rebuild PlayerBattleStats from the battles that have a winner'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started_at = timezone.now()
+        # battles still waiting for process_battle_stats need their skill points, they are
+        # counted by the task once it gets to them
+        waiting_battle_ids = BattleStatsQueueRepository.get_waiting()
+        battles = (
+            Battle.objects.filter(stats_applied=False, battle_end__lte=started_at)
+            .exclude(winner=None)
+            .exclude(id__in=waiting_battle_ids)
+        )
+        marked = 0
+        for lower, upper in self._id_ranges(Battle.objects.all(), batch_size):
+            marked += battles.filter(id__gte=lower, id__lt=upper).update(stats_applied=True)
+        self.stdout.write(f'Marked {marked} battles as applied')
+
+        for lower, upper in self._id_ranges(Player.objects.all(), batch_size):
+            self._rebuild_players(lower, upper)
+        self.stdout.write(self.style.SUCCESS('Rebuilt player battle statistics'))
+
+    @staticmethod
+    def _id_ranges(queryset, batch_size: int):
+        bounds = queryset.aggregate(lower=Min('id'), upper=Max('id'))
+        if bounds['lower'] is None:
+            return
+        for lower in range(bounds['lower'], bounds['upper'] + 1, batch_size):
+            yield lower, lower + batch_size
+
+    @staticmethod
+    def _rebuild_players(lower: int, upper: int) -> None:
+        players = Q(player_id__gte=lower, player_id__lt=upper)
+        wins = Count('id', filter=Q(battle__winner_id=F('player_id')))
+        with transaction.atomic():
+            # battles applied by the task meanwhile wait for the rebuild of their players
+            list(PlayerBattleStats.objects.select_for_update().filter(players).values('id'))
+            PlayerBattleStats.objects.filter(players).delete()
+            battle_players = (
+                BattlePlayer.objects.filter(players, battle__stats_applied=True)
+                .exclude(battle__winner=None)
+                .order_by()
+            )
+            rows = list(
+                battle_players.values('player_id', season_id=F('battle__game_mode_season_id'))
+                .filter(season_id__isnull=False)
+                .annotate(battles_count=Count('id'), wins_count=wins)
+            )
+            rows += list(
+                battle_players.values('player_id').annotate(
+                    battles_count=Count('id'), wins_count=wins
+                )
+            )
+            PlayerBattleStats.objects.bulk_create(
+                [
+                    PlayerBattleStats(
+                        player_id=row['player_id'],
+                        season_id=row.get('season_id'),
+                        battles_count=row['battles_count'],
+                        wins_count=row['wins_count'],
+                        losses_count=row['battles_count'] - row['wins_count'],
+                    )
+                    for row in rows
+                ],
+                batch_size=1000,
+            )
+
+        user_ids = dict(
+            Player.objects.filter(id__gte=lower, id__lt=upper).values_list('id', 'user_id')
+        )
+        cache_keys = set()
+        for row in rows:
+            cache_key = f'user_statistics_{user_ids[row["player_id"]]}'
+            cache_keys.add(cache_key)
+            if row.get('season_id'):
+                cache_keys.add(f'{cache_key}_season_{row["season_id"]}')
+        cache.delete_many(list(cache_keys))
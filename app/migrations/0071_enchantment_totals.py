@@ -0,0 +1,55 @@
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_enchantment_totals(apps, schema_editor):
+    enchantment_model = apps.get_model('app', 'Enchantment')
+    for model_name, target_field in (('Tile', 'tile'), ('CardHand', 'card_hand')):
+
+        def total(flag_field, value_field, target_field=target_field):
+            enchantments = (
+                enchantment_model.objects.filter(
+                    **{target_field: models.OuterRef('pk'), flag_field: True}
+                )
+                .order_by()
+                .values(target_field)
+                .annotate(total=models.Sum(value_field))
+                .values('total')
+            )
+            return Coalesce(models.Subquery(enchantments), 0)
+
+        apps.get_model('app', model_name).objects.update(
+            enchantment_attack=total('affects_attack', 'attack_change_value'),
+            enchantment_hp=total('affects_hp', 'hp_change_value'),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0070_alter_card_description'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cardhand',
+            name='enchantment_attack',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cardhand',
+            name='enchantment_hp',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tile',
+            name='enchantment_attack',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tile',
+            name='enchantment_hp',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_enchantment_totals, migrations.RunPython.noop),
+    ]
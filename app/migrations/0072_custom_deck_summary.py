@@ -0,0 +1,62 @@
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_custom_deck_summary(apps, schema_editor):
+    custom_deck_model = apps.get_model('app', 'CustomDeck')
+    custom_deck_to_card_model = apps.get_model('app', 'CustomDeckToCard')
+
+    def count(**filters):
+        deck_cards = (
+            custom_deck_to_card_model.objects.filter(deck=models.OuterRef('pk'), **filters)
+            .order_by()
+            .values('deck')
+            .annotate(total=models.Count('id'))
+            .values('total')
+        )
+        return Coalesce(models.Subquery(deck_cards), 0)
+
+    custom_deck_model.objects.update(
+        cards_count=count(), disabled_cards_count=count(card__is_enabled=False)
+    )
+
+    element_counts = defaultdict(dict)
+    rows = (
+        custom_deck_to_card_model.objects.order_by()
+        .values('deck_id', 'card__element')
+        .annotate(total=models.Count('id'))
+    )
+    for row in rows:
+        element_counts[row['deck_id']][row['card__element']] = row['total']
+    decks = list(custom_deck_model.objects.filter(id__in=element_counts).only('id'))
+    for deck in decks:
+        deck.element_counts = element_counts[deck.id]
+    custom_deck_model.objects.bulk_update(decks, ['element_counts'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0071_enchantment_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customdeck',
+            name='cards_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customdeck',
+            name='disabled_cards_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customdeck',
+            name='element_counts',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(fill_custom_deck_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0072_custom_deck_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='battle',
+            name='stats_applied',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='PlayerBattleStats',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                ('battles_count', models.IntegerField(default=0)),
+                ('wins_count', models.IntegerField(default=0)),
+                ('losses_count', models.IntegerField(default=0)),
+                (
+                    'player',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='battle_stats',
+                        to='app.player',
+                    ),
+                ),
+                (
+                    'season',
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='player_battle_stats',
+                        to='app.gamemodeseason',
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='playerbattlestats',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(season=None),
+                fields=('player',),
+                name='player_battle_stats_player_uniq',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='playerbattlestats',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(season__isnull=False),
+                fields=('player', 'season'),
+                name='player_battle_stats_season_uniq',
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+def fill_has_warcry(apps, schema_editor):
+    card_model = apps.get_model('app', 'Card')
+    card_model.objects.filter(
+        models.Q(description__icontains='warcry:') | models.Q(description__icontains='warcry</b>:')
+    ).update(has_warcry=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0073_player_battle_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='has_warcry',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(fill_has_warcry, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,7 @@ from typing import Optional
 from uuid import uuid1, uuid4
 
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from djongo import models as mongo_models
 
@@ -110,6 +111,8 @@ class Battle(models.Model):
         null=True,
         related_name='current_battle',
     )
+    # set once the result is counted in PlayerBattleStats and PlayerSeasonStats
+    stats_applied = models.BooleanField(default=False)
 
     def complete(self, winner: Optional[Player]) -> None:
         self.state = Battle.States.COMPLETED
@@ -140,6 +143,68 @@ class CardRelation(models.Model):
         raise NotImplementedError
 
 
+class EnchantmentTotalsQuerySet(models.QuerySet):
+    def refresh_enchantment_totals(self) -> int:
+        """Recalculate enchantment totals of all cards in the queryset with one UPDATE"""
+        target_field = self.model._meta.get_field('enchantments').field.name
+
+        def total(flag_field: str, value_field: str):
+            lookup = {target_field: models.OuterRef('pk'), flag_field: True}
+            enchantments = (
+                Enchantment.objects.filter(**lookup)
+                .order_by()
+                .values(target_field)
+                .annotate(total=models.Sum(value_field))
+                .values('total')
+            )
+            return Coalesce(models.Subquery(enchantments), 0)
+
+        return self.update(
+            enchantment_attack=total('affects_attack', 'attack_change_value'),
+            enchantment_hp=total('affects_hp', 'hp_change_value'),
+        )
+
+
+class EnchantedCardRelation(CardRelation):
+    """Card that can have enchantments, with their attack/hp changes summed on the row"""
+
+    class Meta(CardRelation.Meta):
+        abstract = True
+
+    ENCHANTMENT_TOTAL_FIELDS = ('enchantment_attack', 'enchantment_hp')
+
+    #: Sum of attack changes of the card enchantments, maintained by Enchantment signals
+    enchantment_attack = models.IntegerField(default=0)
+    #: Sum of hp changes of the card enchantments, maintained by Enchantment signals
+    enchantment_hp = models.IntegerField(default=0)
+
+    def save(self, *args, **kwargs):
+        # totals are changed with UPDATE queries, a full save of a stale instance must not
+        # overwrite them
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.ENCHANTMENT_TOTAL_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    def add_enchantment_totals(self, attack: int, hp: int) -> None:
+        """Shift stored totals by the given values, on the row and on this instance"""
+        if not attack and not hp:
+            return
+        type(self).objects.filter(pk=self.pk).update(
+            enchantment_attack=models.F('enchantment_attack') + attack,
+            enchantment_hp=models.F('enchantment_hp') + hp,
+        )
+        self.enchantment_attack += attack
+        self.enchantment_hp += hp
+
+    def refresh_enchantment_totals(self) -> None:
+        type(self).objects.filter(pk=self.pk).refresh_enchantment_totals()
+        self.refresh_from_db(fields=self.ENCHANTMENT_TOTAL_FIELDS)
+
+
 class CardDeck(CardRelation):
     class Meta:
         indexes = [
@@ -160,7 +225,7 @@ class CardDeck(CardRelation):
     )
 
 
-class CardHand(CardRelation):
+class CardHand(EnchantedCardRelation):
     class Meta:
         indexes = [
             models.Index(
@@ -179,20 +244,15 @@ class CardHand(CardRelation):
         'BattlePlayer', on_delete=models.CASCADE, related_name=CardPlaces.hand
     )
     card_death_count = models.IntegerField(default=0)
+    objects = EnchantmentTotalsQuerySet.as_manager()
 
     @property
     def get_attack_with_enchantments(self):
-        base_attack = self.attack
-        for enchantment in self.enchantments.filter(affects_attack=True):
-            base_attack += enchantment.attack_change_value
-        return base_attack
+        return self.attack + self.enchantment_attack
 
     @property
     def get_hp_with_enchantments(self):
-        base_hp = self.hp
-        for enchantment in self.enchantments.filter(affects_hp=True):
-            base_hp += enchantment.hp_change_value
-        return base_hp
+        return self.hp + self.enchantment_hp
 
     def check_if_target_tile_is_valid(self, target_tile) -> bool:
         target_tile_type = 'friendly' if target_tile.player == self.player else 'opponent'
@@ -257,7 +317,7 @@ class CardActiveMystery(CardRelation):
     card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name=CardPlaces.active_mystery)
 
 
-class TileQuerySet(models.QuerySet):
+class TileQuerySet(EnchantmentTotalsQuerySet):
     def non_free(self):
         return self.exclude(state=Tile.States.FREE)
 
@@ -282,7 +342,7 @@ class TileManager(models.Manager):
         return self.get_queryset().exclude_censor()
 
 
-class Tile(CardRelation):
+class Tile(EnchantedCardRelation):
     class Meta:
         indexes = [
             models.Index(
@@ -341,21 +401,12 @@ class Tile(CardRelation):
 
     @property
     def get_attack_with_enchantments(self):
-        # get sum of all buffs/debuffs for attack value
-        attack_difference = (
-            self.enchantments.filter(affects_attack=True).aggregate(
-                attack_change=models.Sum('attack_change_value')
-            )['attack_change']
-            or 0
-        )
-        return max(0, self.attack + attack_difference)  # max ensures that value is positive
+        # max ensures that value is positive
+        return max(0, self.attack + self.enchantment_attack)
 
     @property
     def get_hp_with_enchantments(self):
-        base_hp = self.hp
-        for enchantment in self.enchantments.filter(affects_hp=True):
-            base_hp += enchantment.hp_change_value
-        return base_hp
+        return self.hp + self.enchantment_hp
 
     def flush(self):
         self.card = None
@@ -365,6 +416,9 @@ class Tile(CardRelation):
         self.attack = 0
         self.card_death_count = 0
         self.enchantments.all().delete()
+        # the deletion signals may change other instances of the tile, it has no enchantments
+        self.enchantment_attack = 0
+        self.enchantment_hp = 0
         self.save()
 
 
@@ -579,6 +633,22 @@ class Enchantment(models.Model):
     #: How much damage get card, if empty - usual
     protect = models.PositiveIntegerField(blank=True, null=True)
 
+    @property
+    def target(self) -> Optional[EnchantedCardRelation]:
+        if self.tile_id:
+            return self.tile
+        if self.card_hand_id:
+            return self.card_hand
+        return None
+
+    @property
+    def attack_total_change(self) -> int:
+        return (self.attack_change_value or 0) if self.affects_attack else 0
+
+    @property
+    def hp_total_change(self) -> int:
+        return (self.hp_change_value or 0) if self.affects_hp else 0
+
 
 class BattleLog(models.Model):
     class Meta:
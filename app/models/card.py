@@ -1,12 +1,12 @@
 # pylint: disable=import-outside-toplevel
 import uuid
+from typing import Optional
 
 import mimesis
 from django.db import models
 from django.utils import timezone
 
 from app.enums.card import CardElements, CardRarities, CardTypes, SpellTargetingTypes, SpellTypes
-from app.exceptions import CardAbilityNotFound
 from app.utils.paths import (
     get_card_image_path,
     get_card_regular_image_frame_path,
@@ -41,6 +41,12 @@ SCRIPT_WRAPPER_HELP = (
 )
 
 
+def description_has_warcry(description: Optional[str]) -> bool:
+    """Warcry is declared in the card description, with or without the bold keyword"""
+    description = (description or '').lower()
+    return 'warcry</b>:' in description or 'warcry:' in description
+
+
 class Card(models.Model, BootstrapMixin):
     """
     Card model is responsible for storing all information about a specific card in the db
@@ -103,6 +109,8 @@ class Card(models.Model, BootstrapMixin):
     script_on_period = models.TextField(blank=True, help_text=SCRIPT_WRAPPER_HELP)
     script_on_trigger = models.TextField(blank=True, help_text=SCRIPT_WRAPPER_HELP)
     is_enabled = models.BooleanField(default=False)
+    #: Warcry is declared in the description, stored so triggers don't parse it on every play
+    has_warcry = models.BooleanField(default=False, editable=False)
 
     def __str__(self):
         return self.custom_id
@@ -111,14 +119,16 @@ class Card(models.Model, BootstrapMixin):
         name = mimesis.Text().word
 
     def save(self, *args, **kwargs):
+        self.has_warcry = description_has_warcry(self.description)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'description' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'has_warcry'}
         if not self.is_enabled:
             return super().save(*args, **kwargs)
 
-        from app.card_abilities.card_utils import get_class_card
+        from app.card_abilities.registry import CardAbilityRegistry
 
-        try:
-            get_class_card(self.custom_id)
-        except CardAbilityNotFound:
+        if not CardAbilityRegistry.is_coded(self.custom_id):
             self.is_enabled = False
 
         return super().save(*args, **kwargs)
@@ -1,6 +1,9 @@
 # pylint: disable=import-outside-toplevel
+from collections import defaultdict
+
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Coalesce
 
 from app.enums.card import CardEditions, CardEditionsEnum
 from app.models.player import Player
@@ -39,6 +42,41 @@ class PreAssembledDeckToCard(models.Model):
     order = models.IntegerField(default=0)
 
 
+class CustomDeckQuerySet(models.QuerySet):
+    def refresh_summaries(self) -> None:
+        """Recalculate the stored card summary of all decks in the queryset"""
+        deck_ids = list(self.values_list('id', flat=True))
+        if not deck_ids:
+            return
+
+        def count(**filters):
+            deck_cards = (
+                CustomDeckToCard.objects.filter(deck=models.OuterRef('pk'), **filters)
+                .order_by()
+                .values('deck')
+                .annotate(total=models.Count('id'))
+                .values('total')
+            )
+            return Coalesce(models.Subquery(deck_cards), 0)
+
+        decks = CustomDeck.objects.filter(id__in=deck_ids)
+        decks.update(cards_count=count(), disabled_cards_count=count(card__is_enabled=False))
+
+        element_counts = defaultdict(dict)
+        rows = (
+            CustomDeckToCard.objects.filter(deck_id__in=deck_ids)
+            .order_by()
+            .values('deck_id', 'card__element')
+            .annotate(total=models.Count('id'))
+        )
+        for row in rows:
+            element_counts[row['deck_id']][row['card__element']] = row['total']
+        decks = list(decks.only('id'))
+        for deck in decks:
+            deck.element_counts = element_counts[deck.id]
+        CustomDeck.objects.bulk_update(decks, ['element_counts'])
+
+
 class CustomDeck(models.Model):
     class Meta:
         ordering = ('order',)
@@ -56,6 +94,12 @@ class CustomDeck(models.Model):
     cards = models.ManyToManyField('Card', through='CustomDeckToCard')
     player_cards = models.ManyToManyField('PlayerCard', through='CustomDeckToCard')
     is_generated = models.BooleanField(default=False)
+    # card summary kept by the signals of CustomDeckToCard and Card, see refresh_summaries
+    cards_count = models.IntegerField(default=0)
+    disabled_cards_count = models.IntegerField(default=0)
+    element_counts = models.JSONField(default=dict, blank=True)
+
+    objects = CustomDeckQuerySet.as_manager()
 
     def clean(self):
         if not self.pk and self.player.custom_decks.filter(is_generated=False).count() >= 5:
@@ -73,7 +117,7 @@ class CustomDeck(models.Model):
 
     @property
     def all_cards_coded(self):
-        return all(card.is_enabled for card in self.cards.all())
+        return self.disabled_cards_count == 0
 
 
 def default_player_card_in_custom_deck_to_card(obj):
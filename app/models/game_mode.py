@@ -152,11 +152,29 @@ class PlayerSeasonStats(models.Model):
     def add_skill_points_on_battle_complete(self, battle, is_winner: bool):
         if SkillPointsForBattlePlayer.objects.filter(battle=battle, player=self.player).exists():
             return
+        ladder = {
+            level.level: level
+            for level in self.season.game_mode.game_mode_ladder.filter(
+                level__in=(self.skill_level, self.skill_level + 1)
+            )
+        }
+        skill_points_for_player = self.apply_battle_result(is_winner, ladder)
+        self.save()
+
+        SkillPointsForBattlePlayer.objects.create(
+            battle=battle, player=self.player, skill_points=skill_points_for_player
+        )
+
+    def apply_battle_result(self, is_winner: bool, ladder: dict[int, SkillPointsLadder]) -> int:
+        """Change skill points and level in memory, returns the skill points for the battle
+
+        ``ladder`` maps levels of the game mode ladder to their ladder rows.
+        """
         skill_points_for_player: int
         if is_winner:
             skill_points_for_player = SKILL_POINTS_ON_VICTORY
             self.skill_points += skill_points_for_player
-            next_skill_level = self.next_skill_level_object
+            next_skill_level = ladder.get(self.skill_level + 1)
             if next_skill_level and self.skill_points >= next_skill_level.skill_points_required:
                 self.skill_level += 1
                 self.xp_earned += (
@@ -164,15 +182,51 @@ class PlayerSeasonStats(models.Model):
                 )  # change this logic once we receive api from the web team
         else:
             min_skill_points = 0
-            current_skill_level = self.current_skill_level_object
+            current_skill_level = ladder.get(self.skill_level)
             if current_skill_level:
                 min_skill_points = current_skill_level.skill_points_required
             skill_points_for_player = (
                 SKILL_POINTS_ON_LOSS if self.skill_points > min_skill_points else 0
             )
             self.skill_points += skill_points_for_player
-        self.save()
+        return skill_points_for_player
 
-        SkillPointsForBattlePlayer.objects.create(
-            battle=battle, player=self.player, skill_points=skill_points_for_player
-        )
+
+class PlayerBattleStats(models.Model):
+    """Battle results of a player, for all battles when ``season`` is empty"""
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['player'],
+                condition=Q(season=None),
+                name='player_battle_stats_player_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['player', 'season'],
+                condition=Q(season__isnull=False),
+                name='player_battle_stats_season_uniq',
+            ),
+        ]
+
+    player = models.ForeignKey('Player', on_delete=models.CASCADE, related_name='battle_stats')
+    season = models.ForeignKey(
+        GameModeSeason,
+        on_delete=models.CASCADE,
+        related_name='player_battle_stats',
+        blank=True,
+        null=True,
+    )
+    battles_count = models.IntegerField(default=0)
+    wins_count = models.IntegerField(default=0)
+    losses_count = models.IntegerField(default=0)
+
+    def as_dict(self) -> dict:
+        return {
+            'battles': self.battles_count,
+            'wins': self.wins_count,
+            'losses': self.losses_count,
+            'win_rate': round(self.wins_count / self.battles_count * 100, 2)
+            if self.battles_count
+            else 0,
+        }
@@ -2,17 +2,19 @@
 import datetime
 import logging
 import time
-from typing import Union
+from typing import Optional, Union
 
+from django.conf import settings
 from django.core.cache import cache
 from django.db import models
 from django.utils import timezone
 
 from app.enums.card import CardEditions
+from app.redis_client import redis_client
 from app.utils.user import generate_random_player_id
 
 from .card import Card
-from .game_mode import GameMode, GameModeSeason, PlayerSeasonStats
+from .game_mode import GameMode, GameModeSeason, PlayerBattleStats, PlayerSeasonStats
 from .user import User
 
 logger = logging.getLogger()
@@ -79,10 +81,13 @@ class Player(models.Model):  # pylint: disable=too-many-public-methods
 
     @property
     def is_whitelist_user(self):
-        return WhitelistWallet.objects.filter(wallet__iexact=self.user.metamask_token).exists()
+        from app.repositories.whitelist import WhitelistRepository
+
+        return WhitelistRepository.is_whitelisted(self.user.metamask_token)
 
     def update_last_activity(self):
-        cache.set(f'last_activity-{self.player_id}', timezone.now(), 62)
+        # saved to the database by the update_last_activity task
+        redis_client.zadd(settings.PLAYER_ACTIVITY_REDIS_KEY, {self.player_id: time.time()})
 
     @property
     def days_offline(self):
@@ -189,28 +194,27 @@ class Player(models.Model):  # pylint: disable=too-many-public-methods
         return self.player_cards.exclude(card__custom_id__startswith='DD').count()
 
     @property
-    def battle_statistics(self):
-        from app.utils.statistics import update_player_statistics  # noqa: I252
-
-        user_id = self.user.id
-        statistics_data = cache.get(f'user_statistics_{user_id}')
-
-        if statistics_data:
-            return statistics_data
-
-        return update_player_statistics(user_id=user_id)
+    def battle_statistics(self) -> dict:
+        return self._get_battle_statistics(season_id=None)
 
-    def battle_stats_for_season(self, season_id: int):
-        from app.utils.statistics import update_player_statistics
+    def battle_stats_for_season(self, season_id: int) -> dict:
+        return self._get_battle_statistics(season_id=season_id)
 
+    def _get_battle_statistics(self, season_id: Optional[int]) -> dict:
         user_id = self.user.id
-        statistics_data = cache.get(f'user_statistics_{user_id}_season_{season_id}')
+        cache_key = f'user_statistics_{user_id}'
+        if season_id is not None:
+            cache_key = f'{cache_key}_season_{season_id}'
+        statistics_data = cache.get(cache_key)
 
         if statistics_data:
             return statistics_data
 
-        season = GameModeSeason.objects.get(id=season_id)
-        return update_player_statistics(user_id=user_id, season=season)
+        # kept up to date by BattleStatsProcessor, a missing row means no counted battles
+        stats = PlayerBattleStats.objects.filter(player=self, season_id=season_id).first()
+        statistics_data = (stats or PlayerBattleStats(player=self)).as_dict()
+        cache.set(cache_key, statistics_data, settings.PLAYER_STATISTICS_CACHE_TTL)
+        return statistics_data
 
 
 class Friendship(models.Model):
@@ -1,12 +1,29 @@
-from django.db.models.signals import post_delete, post_save, pre_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from app.repositories.deck import DeckRepository
-from app.utils.statistics import update_player_statistics
+from app.repositories.battle import BattleRepository
+from app.repositories.battle_stats import BattleStatsQueueRepository
+from app.repositories.battle_timer import BattleTimerRepository
+from app.repositories.card import CardRepository
+from app.repositories.player import PlayerRepository
+from app.repositories.statistics import StatisticsRepository, StatisticsTotal
+from app.repositories.whitelist import WhitelistRepository
+from app.services.battle_board import BattleBoard
 
-from .battle import Battle, CardHand
-from .deck import CustomDeck
-from .game_mode import PlayerSeasonStats
+from .battle import (
+    Battle,
+    CardActiveMystery,
+    CardDeck,
+    CardGraveyard,
+    CardHand,
+    Enchantment,
+    Tile,
+)
+from .card import Card
+from .deck import CustomDeck, CustomDeckToCard
+from .game_mode import BlockedCardsInGameMode
+from .player import Player, WhitelistWallet
+from .user import User
 
 
 @receiver(pre_save, sender=CardHand)
@@ -14,37 +31,173 @@ def set_battle_card_id_if_empty(
     sender, instance: CardHand, **kwargs
 ):  # pylint: disable=unused-argument
     if not instance.id and not instance.battle_card_id and instance.card:
-        last_card_id = DeckRepository.last_card_id(instance.player.battle)
-        instance.battle_card_id = last_card_id + 1
-        DeckRepository.set_last_card_id(instance.player.battle, instance.battle_card_id)
+        (instance.battle_card_id,) = BattleRepository.reserve_card_ids(instance.player.battle)
 
 
-@receiver(post_save, sender=Battle)
-def update_payers_stats_on_battle_end(
-    sender, instance: Battle, created, **kwargs
+@receiver(post_save, sender=Enchantment)
+def update_enchantment_totals_on_save(
+    sender, instance: Enchantment, created, raw=False, **kwargs
+):  # pylint: disable=unused-argument
+    target = instance.target
+    if raw or target is None:
+        return
+    if created:
+        target.add_enchantment_totals(instance.attack_total_change, instance.hp_total_change)
+    else:
+        target.refresh_enchantment_totals()
+
+
+@receiver(post_delete, sender=Enchantment)
+def update_enchantment_totals_on_delete(
+    sender, instance: Enchantment, **kwargs
+):  # pylint: disable=unused-argument
+    target = instance.target
+    if target is not None:
+        target.add_enchantment_totals(-instance.attack_total_change, -instance.hp_total_change)
+
+
+def drop_changed_board_rows(
+    sender, instance, raw=False, **kwargs
+):  # pylint: disable=unused-argument
+    if not raw:
+        BattleBoard.row_changed(instance)
+
+
+for board_model in (Tile, CardHand, CardDeck, CardGraveyard, CardActiveMystery, Enchantment):
+    post_save.connect(drop_changed_board_rows, sender=board_model)
+    post_delete.connect(drop_changed_board_rows, sender=board_model)
+
+
+@receiver(pre_save, sender=User)
+def forget_changed_username(
+    sender, instance: User, update_fields=None, raw=False, **kwargs
 ):  # pylint: disable=unused-argument
-    if created or not instance.winner:
+    if raw or not instance.pk or (update_fields is not None and 'username' not in update_fields):
         return
+    old_username = User.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+    if old_username is not None and old_username != instance.username:
+        PlayerRepository.forget_username(old_username)
+
+
+@receiver(post_save, sender=WhitelistWallet)
+@receiver(post_delete, sender=WhitelistWallet)
+def invalidate_whitelist(sender, **kwargs):  # pylint: disable=unused-argument
+    WhitelistRepository.invalidate()
+
+
+@receiver(post_save, sender=CustomDeckToCard)
+@receiver(post_delete, sender=CustomDeckToCard)
+def refresh_deck_summary(
+    sender, instance: CustomDeckToCard, raw=False, **kwargs
+):  # pylint: disable=unused-argument
+    if not raw:
+        CustomDeck.objects.filter(pk=instance.deck_id).refresh_summaries()
+
 
-    season = instance.game_mode_season
-    player_one, player_two = instance.players.all()
-    update_player_statistics(user=player_one.player)
-    update_player_statistics(user=player_one.player, season=instance.game_mode_season)
-    update_player_statistics(user=player_two.player)
-    update_player_statistics(user=player_two.player, season=instance.game_mode_season)
-    if not season:
+@receiver(m2m_changed, sender=CustomDeckToCard)
+def refresh_deck_summary_on_m2m_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):  # pylint: disable=unused-argument
+    if not reverse:
+        deck_ids = {instance.pk}
+    elif action == 'pre_clear':
+        # the decks of the card are not known after the clear
+        lookup = 'card' if isinstance(instance, Card) else 'player_card'
+        instance.cleared_deck_ids = set(
+            CustomDeckToCard.objects.filter(**{lookup: instance}).values_list('deck_id', flat=True)
+        )
         return
-    # add 2SP to winner
-    winner = instance.winner
-    loser = player_one.player if player_one.player.id != winner.id else player_two.player
-    player_season, created = PlayerSeasonStats.objects.get_or_create(player=winner, season=season)
-    player_season.add_skill_points_on_battle_complete(battle=instance, is_winner=True)
+    elif action == 'post_clear':
+        deck_ids = getattr(instance, 'cleared_deck_ids', set())
+    else:
+        deck_ids = pk_set or set()
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        CustomDeck.objects.filter(pk__in=deck_ids).refresh_summaries()
+
 
-    # subtract 1SP from loser
-    loser_player_season, created = PlayerSeasonStats.objects.get_or_create(
-        player=loser, season=season
+@receiver(pre_save, sender=Card)
+def check_deck_summary_fields_change(
+    sender, instance: Card, raw=False, **kwargs
+):  # pylint: disable=unused-argument
+    if raw or instance.pk is None:
+        instance.deck_summary_changed = False
+        return
+    old = Card.objects.filter(pk=instance.pk).values('is_enabled', 'element').first()
+    instance.deck_summary_changed = old is not None and (
+        old['is_enabled'] != instance.is_enabled or old['element'] != instance.element
     )
-    loser_player_season.add_skill_points_on_battle_complete(battle=instance, is_winner=False)
+
+
+@receiver(post_save, sender=Card)
+def refresh_deck_summaries_of_card(
+    sender, instance: Card, **kwargs
+):  # pylint: disable=unused-argument
+    if getattr(instance, 'deck_summary_changed', False):
+        CustomDeck.objects.filter(
+            pk__in=CustomDeckToCard.objects.filter(card=instance).values('deck_id')
+        ).refresh_summaries()
+
+
+@receiver(post_save, sender=Card)
+@receiver(post_delete, sender=Card)
+@receiver(post_save, sender=BlockedCardsInGameMode)
+@receiver(post_delete, sender=BlockedCardsInGameMode)
+def invalidate_card_pools(sender, **kwargs):  # pylint: disable=unused-argument
+    CardRepository.invalidate_card_pools()
+
+
+@receiver(post_save, sender=Battle)
+def count_battle_statistics(
+    sender, instance: Battle, created, raw=False, **kwargs
+):  # pylint: disable=unused-argument
+    if raw:
+        return
+    if created:
+        StatisticsRepository.incr_total(StatisticsTotal.BATTLES)
+    if instance.battle_end:
+        StatisticsRepository.add_ended_battle(instance.id, instance.battle_end.date())
+
+
+@receiver(post_delete, sender=Battle)
+def uncount_deleted_battle(sender, **kwargs):  # pylint: disable=unused-argument
+    StatisticsRepository.incr_total(StatisticsTotal.BATTLES, -1)
+
+
+@receiver(post_save, sender=Player)
+def count_created_player(
+    sender, created, raw=False, **kwargs
+):  # pylint: disable=unused-argument
+    if created and not raw:
+        StatisticsRepository.incr_total(StatisticsTotal.PLAYERS)
+
+
+@receiver(post_delete, sender=Player)
+def uncount_deleted_player(sender, **kwargs):  # pylint: disable=unused-argument
+    StatisticsRepository.incr_total(StatisticsTotal.PLAYERS, -1)
+
+
+@receiver(post_save, sender=Battle)
+def cancel_outdated_battle_timers(
+    sender, instance: Battle, created, **kwargs
+):  # pylint: disable=unused-argument
+    if created:
+        return
+    if instance.state in (Battle.States.COMPLETED, Battle.States.DISCARDED):
+        BattleTimerRepository.cancel_battle(instance.id)
+    elif instance.state in Battle.States.active_states():
+        BattleTimerRepository.cancel_stale_end_turn(instance)
+
+
+@receiver(post_save, sender=Battle)
+def update_payers_stats_on_battle_end(
+    sender, instance: Battle, created, **kwargs
+):  # pylint: disable=unused-argument
+    if created or instance.state != Battle.States.COMPLETED or instance.stats_applied:
+        return
+    if not instance.winner_id:
+        return
+    # statistics and skill points are applied in batches by the process_battle_stats task
+    BattleStatsQueueRepository.push(instance.id)
 
 
 @receiver(post_delete, sender=CustomDeck, dispatch_uid='CustomDeck_delete')
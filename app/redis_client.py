@@ -2,3 +2,5 @@ from django.conf import settings
 from redis import Redis
 
 redis_client = Redis(settings.REDIS_HOST, db=1, decode_responses=True)
+# battle state is stored in a binary format, see app.schemas.battle_codec
+redis_binary_client = Redis(settings.REDIS_HOST, db=1)
@@ -1,24 +1,89 @@
+# pylint: disable=too-many-lines
 import logging
 from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 from time import time
 from typing import Optional
 from uuid import uuid4
 
 from django.conf import settings
+from redis import WatchError
 
-from app.exceptions import PermissionDenied
+from app.exceptions import BattleStateConflict, PermissionDenied
 from app.models.battle import Battle, BattlePlayer
 from app.models.game_mode import GameMode
 from app.models.player import Player
-from app.redis_client import redis_client
+from app.redis_client import redis_binary_client, redis_client
 from app.repositories.base import BaseRepository
 from app.repositories.battle_player import BattlePlayerRepository
 from app.schemas import battle as schemas
+from app.schemas.battle_codec import decode_battle_state, encode_battle_state
 
 logger = logging.getLogger('django.channels.server')
 
 
+class BattleStateUnitOfWork:
+    """
+    Battle state loaded once for the duration of an action.
+
+    The state key is WATCHed when it is read, so the state is written back only if nobody
+    else changed it in between. The card id counter expires together with the state.
+    """
+
+    def __init__(self, key: str, card_id_key: str):
+        self.key = key
+        self.card_id_key = card_id_key
+        self.state: Optional[schemas.Battle] = None
+        self.is_changed = False
+        self._pipeline = redis_binary_client.pipeline()
+
+    def get(self) -> schemas.Battle:
+        if self.state is None:
+            self._pipeline.watch(self.key)
+            self.state = decode_battle_state(self._pipeline.get(self.key))
+        return self.state
+
+    def set(self, new_state: schemas.Battle) -> None:
+        self.state = new_state
+        self.is_changed = True
+
+    def commit(self) -> None:
+        if not self.is_changed:
+            return
+        self._pipeline.multi()
+        self._pipeline.set(self.key, encode_battle_state(self.state), settings.BATTLE_STATE_TTL)
+        self._pipeline.expire(self.card_id_key, settings.BATTLE_STATE_TTL)
+        try:
+            self._pipeline.execute()
+        except WatchError:
+            raise BattleStateConflict(key=self.key) from None
+
+    def close(self) -> None:
+        self._pipeline.reset()
+
+
+# Reserves ARGV[1] battle card ids, the counter is created from ARGV[2] (last id stored in
+# the battle state) and returns nil when it doesn't exist and no initial value is given
+RESERVE_CARD_IDS_SCRIPT = redis_client.register_script(
+    """
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        if ARGV[2] == '' then
+            return false
+        end
+        redis.call('SET', KEYS[1], ARGV[2])
+    end
+    local last_card_id = redis.call('INCRBY', KEYS[1], ARGV[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    return last_card_id
+    """
+)
+
+_units_of_work: ContextVar[dict[str, BattleStateUnitOfWork]] = ContextVar(
+    'battle_state_units_of_work', default={}
+)
+
+
 class BattleRepository(BaseRepository):  # pylint: disable=too-many-public-methods
 
     DB_MODEL = Battle
@@ -26,9 +91,38 @@ class BattleRepository(BaseRepository):  # pylint: disable=too-many-public-metho
     @classmethod
     @contextmanager
     def lock(cls, battle: Battle):
-        with redis_client.lock(cls.get_key(battle)):
+        with redis_client.lock(f'{cls.get_key(battle)}-lock'):
             yield
 
+    @classmethod
+    @contextmanager
+    def unit_of_work(cls, battle: Battle):
+        """
+        Share one battle state between all repository calls made inside the block.
+
+        The state is read from redis at most once and written back once on exit, nested
+        blocks for the same battle reuse the outer one.
+        Raises :class:`BattleStateConflict` if the state was changed concurrently.
+        """
+        key = cls.get_key(battle)
+        units_of_work = _units_of_work.get()
+        if key in units_of_work:
+            yield units_of_work[key]
+            return
+
+        unit_of_work = BattleStateUnitOfWork(key, cls.get_card_id_key(battle))
+        token = _units_of_work.set({**units_of_work, key: unit_of_work})
+        try:
+            yield unit_of_work
+            unit_of_work.commit()
+        finally:
+            _units_of_work.reset(token)
+            unit_of_work.close()
+
+    @classmethod
+    def _get_unit_of_work(cls, battle: Battle) -> Optional[BattleStateUnitOfWork]:
+        return _units_of_work.get().get(cls.get_key(battle))
+
     @classmethod
     def create_battle(
         cls,
@@ -79,31 +173,86 @@ class BattleRepository(BaseRepository):  # pylint: disable=too-many-public-metho
 
     @classmethod
     def _remove_state_in_redis(cls, battle: Battle) -> None:
-        redis_client.delete(cls.get_key(battle))
+        redis_client.delete(cls.get_key(battle), cls.get_card_id_key(battle))
 
     @classmethod
     def get_state_from_redis(cls, battle: Battle) -> schemas.Battle:
+        unit_of_work = cls._get_unit_of_work(battle)
+        if unit_of_work:
+            return unit_of_work.get()
         return cls._get_state_from_redis(battle)
 
     @classmethod
     def _get_state_from_redis(cls, battle: Battle) -> schemas.Battle:
-        return schemas.Battle.parse_raw(redis_client.get(cls.get_key(battle)))
+        return decode_battle_state(redis_binary_client.get(cls.get_key(battle)))
 
     @classmethod
     def get_key(cls, battle: Battle) -> str:
         return f'{settings.BATTLE_STATE_REDIS_PREFIX}-{battle.room_id}'
 
+    @classmethod
+    def get_card_id_key(cls, battle: Battle) -> str:
+        return f'{cls.get_key(battle)}-card-id'
+
+    @classmethod
+    def reserve_card_ids(cls, battle: Battle, count: int = 1) -> range:
+        """
+        Allocate ``count`` consecutive battle card ids with a single INCRBY.
+
+        The counter starts from ``last_battle_card_id`` of the stored state. Its TTL is
+        refreshed on every state write, so it never expires before the state does and can't
+        restart from a stale ``last_battle_card_id``, which is only kept in sync while a unit
+        of work is active.
+        """
+        key = cls.get_card_id_key(battle)
+        ttl = settings.BATTLE_STATE_TTL
+        last_card_id = RESERVE_CARD_IDS_SCRIPT(keys=[key], args=[count, '', ttl])
+        if last_card_id is None:
+            initial_id = cls.get_state_from_redis(battle).last_battle_card_id
+            last_card_id = RESERVE_CARD_IDS_SCRIPT(keys=[key], args=[count, initial_id, ttl])
+        cls._sync_last_card_id_in_state(battle, last_card_id)
+        return range(last_card_id - count + 1, last_card_id + 1)
+
+    @classmethod
+    def get_last_card_id(cls, battle: Battle) -> int:
+        last_card_id = redis_client.get(cls.get_card_id_key(battle))
+        if last_card_id is None:
+            return cls.get_state_from_redis(battle).last_battle_card_id
+        return int(last_card_id)
+
+    @classmethod
+    def set_last_card_id(cls, battle: Battle, last_card_id: int) -> None:
+        redis_client.set(cls.get_card_id_key(battle), last_card_id, settings.BATTLE_STATE_TTL)
+        cls._sync_last_card_id_in_state(battle, last_card_id)
+
+    @classmethod
+    def _sync_last_card_id_in_state(cls, battle: Battle, last_card_id: int) -> None:
+        unit_of_work = cls._get_unit_of_work(battle)
+        if unit_of_work is None:
+            # the counter is the source of truth, don't rewrite the whole state for it
+            return
+        state = unit_of_work.get()
+        state.last_battle_card_id = last_card_id
+        unit_of_work.set(state)
+
     @classmethod
     def update_state_in_redis(cls, battle: Battle, new_state: schemas.Battle) -> None:
         if new_state is None:
             raise TypeError('Are you dyrak? Trying to save None as state')
 
+        unit_of_work = cls._get_unit_of_work(battle)
+        if unit_of_work:
+            unit_of_work.set(new_state)
+            return
         logger.info('Update state in redis for battle %s', battle.id)
         cls._update_state_in_redis(battle, new_state)
 
     @classmethod
     def _update_state_in_redis(cls, battle: Battle, new_state: schemas.Battle) -> None:
-        redis_client.set(cls.get_key(battle), new_state.json(), settings.BATTLE_STATE_TTL)
+        pipeline = redis_binary_client.pipeline()
+        pipeline.set(cls.get_key(battle), encode_battle_state(new_state), settings.BATTLE_STATE_TTL)
+        pipeline.expire(cls.get_card_id_key(battle), settings.BATTLE_STATE_TTL)
+        pipeline.execute()
 
     @staticmethod
     def set_battle_in_redis(
@@ -0,0 +1,110 @@
+from django.conf import settings
+
+from app.redis_client import redis_client
+
+# Moves up to ARGV[1] ids from the head of the queue to the processing list of a worker and
+# starts the lease of that list
+POP_BATTLE_STATS_SCRIPT = redis_client.register_script(
+    """
+    local battle_ids = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+    if #battle_ids == 0 then
+        return {}
+    end
+    redis.call('LTRIM', KEYS[1], #battle_ids, -1)
+    redis.call('RPUSH', KEYS[2], unpack(battle_ids))
+    redis.call('SET', KEYS[3], 1, 'EX', ARGV[2])
+    redis.call('SADD', KEYS[4], ARGV[3])
+    return battle_ids
+    """
+)
+
+# Returns the processing list of worker ARGV[1] to the head of the queue, unless ARGV[2] is
+# empty and the lease of the worker is still running
+REQUEUE_BATTLE_STATS_SCRIPT = redis_client.register_script(
+    """
+    if ARGV[2] == '' and redis.call('EXISTS', KEYS[3]) == 1 then
+        return 0
+    end
+    local battle_ids = redis.call('LRANGE', KEYS[2], 0, -1)
+    for idx = #battle_ids, 1, -1 do
+        redis.call('LPUSH', KEYS[1], battle_ids[idx])
+    end
+    redis.call('DEL', KEYS[2], KEYS[3])
+    redis.call('SREM', KEYS[4], ARGV[1])
+    return #battle_ids
+    """
+)
+
+
+class BattleStatsQueueRepository:
+    """
+    Ids of completed battles waiting for the ``process_battle_stats`` task, in a redis list.
+
+    Popped ids are moved to a processing list of the worker and removed only after the batch is
+    applied. The list of a worker that died before that is returned to the queue once its lease
+    of ``BATTLE_STATS_PROCESSING_TTL`` runs out. A battle can be pushed more than once, the task
+    skips battles whose statistics are already applied.
+    """
+
+    @staticmethod
+    def get_processing_key(worker_id: str) -> str:
+        return f'{settings.BATTLE_STATS_QUEUE_REDIS_KEY}-processing-{worker_id}'
+
+    @classmethod
+    def get_lease_key(cls, worker_id: str) -> str:
+        return f'{cls.get_processing_key(worker_id)}-lease'
+
+    @staticmethod
+    def get_workers_key() -> str:
+        return f'{settings.BATTLE_STATS_QUEUE_REDIS_KEY}-workers'
+
+    @classmethod
+    def _get_keys(cls, worker_id: str) -> list[str]:
+        return [
+            settings.BATTLE_STATS_QUEUE_REDIS_KEY,
+            cls.get_processing_key(worker_id),
+            cls.get_lease_key(worker_id),
+            cls.get_workers_key(),
+        ]
+
+    @staticmethod
+    def push(battle_id: int) -> None:
+        redis_client.rpush(settings.BATTLE_STATS_QUEUE_REDIS_KEY, battle_id)
+
+    @classmethod
+    def pop(cls, worker_id: str, count: int) -> list[int]:
+        battle_ids = POP_BATTLE_STATS_SCRIPT(
+            keys=cls._get_keys(worker_id),
+            args=[count, settings.BATTLE_STATS_PROCESSING_TTL, worker_id],
+        )
+        return [int(battle_id) for battle_id in battle_ids]
+
+    @classmethod
+    def ack(cls, worker_id: str) -> None:
+        """Forget the processing list of the worker once its battles are applied"""
+        pipeline = redis_client.pipeline()
+        pipeline.delete(cls.get_processing_key(worker_id), cls.get_lease_key(worker_id))
+        pipeline.srem(cls.get_workers_key(), worker_id)
+        pipeline.execute()
+
+    @classmethod
+    def requeue(cls, worker_id: str) -> int:
+        """Return battles of a failed batch to the head of the queue"""
+        return REQUEUE_BATTLE_STATS_SCRIPT(keys=cls._get_keys(worker_id), args=[worker_id, 1])
+
+    @classmethod
+    def requeue_abandoned(cls) -> int:
+        """Return battles left by workers whose lease ran out, returns the number of battles"""
+        return sum(
+            REQUEUE_BATTLE_STATS_SCRIPT(keys=cls._get_keys(worker_id), args=[worker_id, ''])
+            for worker_id in redis_client.smembers(cls.get_workers_key())
+        )
+
+    @classmethod
+    def get_waiting(cls) -> set[int]:
+        """Ids in the queue and in processing lists of the workers"""
+        pipeline = redis_client.pipeline()
+        pipeline.lrange(settings.BATTLE_STATS_QUEUE_REDIS_KEY, 0, -1)
+        for worker_id in redis_client.smembers(cls.get_workers_key()):
+            pipeline.lrange(cls.get_processing_key(worker_id), 0, -1)
+        return {int(battle_id) for battle_ids in pipeline.execute() for battle_id in battle_ids}
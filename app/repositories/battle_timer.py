@@ -0,0 +1,167 @@
+import json
+from enum import Enum
+from time import time
+from typing import Iterable, Optional
+
+from django.conf import settings
+
+from app.models.battle import Battle
+from app.redis_client import redis_client
+
+# Takes up to ARGV[2] timers due at ARGV[1] with their payloads, a timer is taken only once
+# even when pollers overlap
+POP_DUE_TIMERS_SCRIPT = redis_client.register_script(
+    """
+    local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+    if #due == 0 then
+        return {}
+    end
+    local payloads = redis.call('HMGET', KEYS[2], unpack(due))
+    redis.call('ZREM', KEYS[1], unpack(due))
+    redis.call('HDEL', KEYS[2], unpack(due))
+    local result = {}
+    for idx, timer_id in ipairs(due) do
+        result[idx * 2 - 1] = timer_id
+        result[idx * 2] = payloads[idx] or '{}'
+    end
+    return result
+    """
+)
+
+# Cancels the end turn timer ARGV[1] when it was scheduled for a turn before turn number ARGV[2]
+# of player ARGV[3], ARGV[4] is the player that starts every turn number
+CANCEL_STALE_END_TURN_SCRIPT = redis_client.register_script(
+    """
+    local payload = redis.call('HGET', KEYS[2], ARGV[1])
+    if not payload then
+        return 0
+    end
+    local function position(turn_number, turn_idx)
+        local second = 0
+        if turn_idx and turn_idx ~= cjson.null and turn_idx ~= tonumber(ARGV[4]) then
+            second = 1
+        end
+        return (tonumber(turn_number) or 0) * 2 + second
+    end
+    local timer = cjson.decode(payload)
+    local saved = position(ARGV[2], tonumber(ARGV[3]))
+    if saved <= position(timer['turn_number'], timer['turn_idx']) then
+        return 0
+    end
+    redis.call('ZREM', KEYS[1], ARGV[1])
+    redis.call('HDEL', KEYS[2], ARGV[1])
+    return 1
+    """
+)
+
+
+class BattleTimerKind(str, Enum):
+    END_TURN = 'end-turn'
+    BATTLE_DURATION = 'battle-duration'
+
+
+class BattleTimerRepository:
+    """
+    Battle timers in a redis sorted set of timer ids scored with the time they fire at.
+
+    Payloads are kept in a hash next to it. Timers are taken by the ``fire_battle_timers`` task
+    that polls the set every second and runs each of them as its own task. Timer ids are built from the battle, so a battle has one
+    timer of a kind and scheduling the timer of the next turn replaces the one of the previous
+    turn. Timers that fire for a battle that has moved on are counted as stale.
+    """
+
+    @staticmethod
+    def get_timer_id(kind: BattleTimerKind, battle_id: int, *parts) -> str:
+        return ':'.join(str(part) for part in (kind.value, battle_id, *parts))
+
+    @staticmethod
+    def get_kind(timer_id: str) -> BattleTimerKind:
+        return BattleTimerKind(timer_id.split(':', 1)[0])
+
+    @classmethod
+    def schedule(cls, timer_id: str, delay: float, payload: dict) -> None:
+        pipeline = redis_client.pipeline()
+        pipeline.zadd(settings.BATTLE_TIMERS_REDIS_KEY, {timer_id: time() + delay})
+        pipeline.hset(settings.BATTLE_TIMERS_PAYLOAD_REDIS_KEY, timer_id, json.dumps(payload))
+        pipeline.execute()
+
+    @classmethod
+    def cancel(cls, timer_ids: Iterable[str]) -> None:
+        timer_ids = list(timer_ids)
+        if not timer_ids:
+            return
+        pipeline = redis_client.pipeline()
+        pipeline.zrem(settings.BATTLE_TIMERS_REDIS_KEY, *timer_ids)
+        pipeline.hdel(settings.BATTLE_TIMERS_PAYLOAD_REDIS_KEY, *timer_ids)
+        pipeline.execute()
+
+    @classmethod
+    def cancel_battle(cls, battle_id: int) -> None:
+        """Cancel the turn and duration timers of a finished battle"""
+        cls.cancel(
+            cls.get_timer_id(kind, battle_id)
+            for kind in (BattleTimerKind.END_TURN, BattleTimerKind.BATTLE_DURATION)
+        )
+
+    @classmethod
+    def schedule_end_turn(
+        cls,
+        battle: Battle,
+        delay: float,
+        player_id: Optional[int],
+        opponent_id: Optional[int],
+    ) -> None:
+        cls.schedule(
+            cls.get_timer_id(BattleTimerKind.END_TURN, battle.id),
+            delay,
+            {
+                'battle_id': battle.id,
+                'turn_number': battle.turn_number,
+                'turn_idx': battle.turn,
+                'player_id': player_id,
+                'opponent_id': opponent_id,
+            },
+        )
+
+    @classmethod
+    def cancel_stale_end_turn(cls, battle: Battle) -> bool:
+        """
+        Cancel the end turn timer when the battle has moved past its turn.
+
+        Only a later turn cancels it, a save of a stale battle instance keeps the timer.
+        """
+        return bool(
+            CANCEL_STALE_END_TURN_SCRIPT(
+                keys=[settings.BATTLE_TIMERS_REDIS_KEY, settings.BATTLE_TIMERS_PAYLOAD_REDIS_KEY],
+                args=[
+                    cls.get_timer_id(BattleTimerKind.END_TURN, battle.id),
+                    battle.turn_number if battle.turn_number is not None else '',
+                    battle.turn if battle.turn is not None else '',
+                    battle.first_turn_idx,
+                ],
+            )
+        )
+
+    @staticmethod
+    def count_stale_fire(kind: BattleTimerKind) -> None:
+        redis_client.hincrby(settings.BATTLE_TIMERS_STALE_FIRES_REDIS_KEY, kind.value)
+
+    @staticmethod
+    def get_stale_fires() -> dict[str, int]:
+        stale_fires = redis_client.hgetall(settings.BATTLE_TIMERS_STALE_FIRES_REDIS_KEY)
+        return {kind: int(count) for kind, count in stale_fires.items()}
+
+    @staticmethod
+    def count_scheduled() -> int:
+        return redis_client.zcard(settings.BATTLE_TIMERS_REDIS_KEY)
+
+    @staticmethod
+    def pop_due(limit: int) -> list[tuple[str, dict]]:
+        result = POP_DUE_TIMERS_SCRIPT(
+            keys=[settings.BATTLE_TIMERS_REDIS_KEY, settings.BATTLE_TIMERS_PAYLOAD_REDIS_KEY],
+            args=[time(), limit],
+        )
+        return [
+            (timer_id, json.loads(payload))
+            for timer_id, payload in zip(result[::2], result[1::2])
+        ]
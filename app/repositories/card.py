@@ -1,4 +1,10 @@
+import random
+
+from django.conf import settings
+
 from app.models.card import Card
+from app.models.game_mode import GameMode
+from app.redis_client import redis_client
 from app.repositories.base import BaseRepository
 
 
@@ -9,3 +15,45 @@ class CardRepository(BaseRepository):
     @staticmethod
     def get_published_cards() -> set[Card]:
         return set(Card.objects.filter(is_enabled=True))
+
+    @staticmethod
+    def get_card_pool_key(game_mode: GameMode) -> str:
+        version = redis_client.get(settings.CARD_POOL_VERSION_REDIS_KEY) or 0
+        return f'{settings.CARD_POOL_REDIS_PREFIX}-{version}-{game_mode.id}'
+
+    @classmethod
+    def get_random_cards(cls, game_mode: GameMode, count: int) -> list[Card]:
+        """
+        Up to ``count`` distinct published cards that are not blocked in the game mode.
+
+        Ids of the eligible cards are kept in a redis set per game mode, the sample is taken
+        with ``SRANDMEMBER`` and only the sampled cards are loaded. The sample is shuffled, the
+        order of ``SRANDMEMBER`` replies is not random enough to be the draw order.
+        """
+        key = cls.get_card_pool_key(game_mode)
+        card_ids = [int(card_id) for card_id in redis_client.srandmember(key, count)]
+        if not card_ids:
+            pool = cls._load_card_pool(game_mode, key)
+            card_ids = random.sample(pool, min(count, len(pool)))
+        random.shuffle(card_ids)
+        cards = Card.objects.in_bulk(card_ids)
+        return [cards[card_id] for card_id in card_ids if card_id in cards]
+
+    @staticmethod
+    def _load_card_pool(game_mode: GameMode, key: str) -> list[int]:
+        card_ids = list(
+            Card.objects.filter(is_enabled=True)
+            .exclude(blocked_cards__game_mode=game_mode)
+            .values_list('id', flat=True)
+        )
+        if card_ids:
+            pipeline = redis_client.pipeline()
+            pipeline.sadd(key, *card_ids)
+            pipeline.expire(key, settings.CARD_POOL_TTL)
+            pipeline.execute()
+        return card_ids
+
+    @staticmethod
+    def invalidate_card_pools() -> None:
+        """Pools of the previous version are not read anymore and expire"""
+        redis_client.incr(settings.CARD_POOL_VERSION_REDIS_KEY)
@@ -28,7 +28,7 @@ class DeckRepository(BaseRepository):  # pylint: disable=too-many-public-methods
     def is_playable(count_cards: int, custom_deck: CustomDeck) -> bool:
         if ALLOW_ANY_DECK:
             return True
-        return custom_deck.cards.all().count() == count_cards and custom_deck.all_cards_coded
+        return custom_deck.cards_count == count_cards and custom_deck.all_cards_coded
 
     @staticmethod
     def remove_from_deck(deck_card: CardDeck) -> None:
@@ -46,33 +46,26 @@ class DeckRepository(BaseRepository):  # pylint: disable=too-many-public-methods
 
     @classmethod
     def last_card_id(cls, battle) -> int:
-        state = BattleRepository.get_state_from_redis(battle=battle)
-        return state.last_battle_card_id
+        return BattleRepository.get_last_card_id(battle)
 
     @classmethod
     def set_last_card_id(cls, battle, new_id: int):
-        state = BattleRepository.get_state_from_redis(battle=battle)
-        state.last_battle_card_id = new_id
-        BattleRepository.update_state_in_redis(battle=battle, new_state=state)
+        BattleRepository.set_last_card_id(battle, new_id)
 
     @classmethod
     def _create(cls, battle_player: BattlePlayer, cards: list[Card]):
-        deck_cards_to_create = []
-        last_card_id = cls.last_card_id(battle=battle_player.battle)
-        for idx, card in enumerate(cards):
-            last_card_id += 1
-            deck_cards_to_create.append(
-                CardDeck(
-                    card=card,
-                    player=battle_player,
-                    order=idx,
-                    battle_card_id=last_card_id,
-                    hp=card.hp,
-                    attack=card.attack,
-                )
+        battle_card_ids = BattleRepository.reserve_card_ids(battle_player.battle, len(cards))
+        deck_cards_to_create = [
+            CardDeck(
+                card=card,
+                player=battle_player,
+                order=idx,
+                battle_card_id=battle_card_id,
+                hp=card.hp,
+                attack=card.attack,
             )
-        cls.set_last_card_id(battle=battle_player.battle, new_id=last_card_id)
-
+            for idx, (card, battle_card_id) in enumerate(zip(cards, battle_card_ids))
+        ]
         CardDeck.objects.bulk_create(deck_cards_to_create)
 
     @staticmethod
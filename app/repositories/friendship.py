@@ -28,7 +28,9 @@ class FriendshipRepository:
     def get_friendship_list(
         player: Player, is_accepted: Optional[bool] = None
     ) -> Iterable[Friendship]:
-        queryset = Friendship.objects.filter(Q(friend=player) | Q(player=player))
+        queryset = Friendship.objects.filter(Q(friend=player) | Q(player=player)).select_related(
+            'player__user', 'player__status', 'friend__user', 'friend__status'
+        )
         if is_accepted is not None:
             return queryset.filter(is_accepted=is_accepted)
         return queryset
@@ -1,61 +1,132 @@
-from typing import Optional, Union
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, Optional, Union
 
 from django.conf import settings
+from django.utils import timezone
 
-from app.models.player import Player
+from app.models.player import Player, PlayerActivity
 from app.models.player import PlayerStatus as PlayerStatusModel
 from app.redis_client import redis_client
 from app.repositories.base import BaseRepository
+from app.repositories.statistics import StatisticsRepository
 from app.schemas.player import PlayerStatusOverWebsocket
 from app.schemas.ws_schemas import PlayerStatus
+from app.services.lru_cache import LRUCache
 
 
 class PlayerRepository(BaseRepository):
 
     DB_MODEL = Player
 
+    #: username -> player id, in front of the redis keys of ``get_username_key``
+    _player_ids_by_username = LRUCache(max_size=settings.PLAYER_USERNAME_CACHE_SIZE)
+
+    @staticmethod
+    def get_username_key(username: str) -> str:
+        return f'{settings.PLAYER_USERNAME_REDIS_PREFIX}-{username}'
+
     @classmethod
-    def get_player_status(cls, player: Player) -> PlayerStatus:
-        status_over_websocket = cls.get_player_status_over_websocket(player)
-        if status_over_websocket == PlayerStatusOverWebsocket.IN_BATTLE:
-            return PlayerStatus(
-                title=status_over_websocket.value,
-                name=status_over_websocket.value,
-            )
+    def find_by_username(cls, username: str) -> Optional[Player]:
+        """
+        Player with user and status by username.
 
-        if status_over_websocket == PlayerStatusOverWebsocket.ONLINE:
-            if player.status:
-                return PlayerStatus(title=player.status.title, name=player.status.name)
-            return PlayerStatus(
-                title=status_over_websocket.value,
-                name=status_over_websocket.value,
-            )
-        return PlayerStatus(
-            title=status_over_websocket.value,
-            name=status_over_websocket.value,
+        The player id is cached, so known usernames are loaded by primary key. A cached id is
+        checked against the loaded username, an entry left by a rename is dropped.
+        """
+        player_id = cls._get_cached_player_id(username)
+        if player_id is not None:
+            player = Player.objects.select_related('user', 'status').filter(pk=player_id).first()
+            if player is not None and player.user.username == username:
+                return player
+            cls.forget_username(username)
+
+        player = (
+            Player.objects.select_related('user', 'status')
+            .filter(user__username=username)
+            .first()
         )
+        if player is not None:
+            cls._player_ids_by_username.set(username, player.id)
+            redis_client.set(
+                cls.get_username_key(username), player.id, ex=settings.PLAYER_USERNAME_CACHE_TTL
+            )
+        return player
+
+    @classmethod
+    def _get_cached_player_id(cls, username: str) -> Optional[int]:
+        player_id = cls._player_ids_by_username.get(username)
+        if player_id is not None:
+            return player_id
+        player_id = redis_client.get(cls.get_username_key(username))
+        if player_id is None:
+            return None
+        cls._player_ids_by_username.set(username, int(player_id))
+        return int(player_id)
+
+    @classmethod
+    def forget_username(cls, username: str) -> None:
+        cls._player_ids_by_username.delete(username)
+        redis_client.delete(cls.get_username_key(username))
+
+    @classmethod
+    def get_player_status(cls, player: Player) -> PlayerStatus:
+        return cls.get_player_statuses([player])[player.id]
+
+    @classmethod
+    def get_player_statuses(cls, players: Iterable[Player]) -> dict[int, PlayerStatus]:
+        """Statuses of many players by player id"""
+        players = list(players)
+        presence = cls.get_presence_many(players)
+        return {
+            player.id: cls._get_player_status(player, presence[player.id]) for player in players
+        }
+
+    @classmethod
+    def get_presence_many(
+        cls, players: Iterable[Player]
+    ) -> dict[int, PlayerStatusOverWebsocket]:
+        """Websocket presence of many players by player id, checked in one redis pipeline"""
+        players = list(players)
+        pipeline = redis_client.pipeline(transaction=False)
+        for player in players:
+            pipeline.zcard(cls._battle_group_name(player))
+            pipeline.zcard(cls._lobby_group_name(player))
+        connections = pipeline.execute()
+        presence = {}
+        for idx, player in enumerate(players):
+            has_battle_connection, has_lobby_connection = connections[idx * 2 : idx * 2 + 2]
+            if has_battle_connection:
+                presence[player.id] = PlayerStatusOverWebsocket.IN_BATTLE
+            elif has_lobby_connection:
+                presence[player.id] = PlayerStatusOverWebsocket.ONLINE
+            else:
+                presence[player.id] = PlayerStatusOverWebsocket.OFFLINE
+        return presence
 
     @staticmethod
-    def _has_lobby_connection(player: Player) -> bool:
-        lobby_group_name = (
-            f'asgi:group:{settings.LOBBY_CONSUMER_REDIS_GROUP_PREFIX}-{player.user_id}'
-        )
-        return bool(redis_client.zcard(lobby_group_name))
+    def _get_player_status(
+        player: Player, status_over_websocket: PlayerStatusOverWebsocket
+    ) -> PlayerStatus:
+        if status_over_websocket == PlayerStatusOverWebsocket.ONLINE and player.status:
+            return PlayerStatus(title=player.status.title, name=player.status.name)
+        return PlayerStatus(title=status_over_websocket.value, name=status_over_websocket.value)
 
     @staticmethod
-    def _has_battle_connection(player: Player) -> bool:
-        battle_group_name = (
-            f'asgi:group:{settings.BATTLE_CONSUMER_REDIS_GROUP_PREFIX}-{player.user_id}-events'
-        )
-        return bool(redis_client.zcard(battle_group_name))
+    def _lobby_group_name(player: Player) -> str:
+        return f'asgi:group:{settings.LOBBY_CONSUMER_REDIS_GROUP_PREFIX}-{player.user_id}'
+
+    @staticmethod
+    def _battle_group_name(player: Player) -> str:
+        return f'asgi:group:{settings.BATTLE_CONSUMER_REDIS_GROUP_PREFIX}-{player.user_id}-events'
 
     @classmethod
     def is_status_online(cls, player: Player) -> bool:
-        return cls._has_lobby_connection(player) and not cls._has_battle_connection(player)
+        return cls.get_player_status_over_websocket(player) == PlayerStatusOverWebsocket.ONLINE
 
     @classmethod
     def is_status_in_battle(cls, player: Player) -> bool:
-        return cls._has_battle_connection(player)
+        return cls.get_player_status_over_websocket(player) == PlayerStatusOverWebsocket.IN_BATTLE
 
     @classmethod
     def is_status_changeable(
@@ -72,11 +143,7 @@ class PlayerRepository(BaseRepository):
 
     @classmethod
     def get_player_status_over_websocket(cls, player: Player) -> PlayerStatusOverWebsocket:
-        if cls.is_status_in_battle(player):
-            return PlayerStatusOverWebsocket.IN_BATTLE
-        if cls.is_status_online(player):
-            return PlayerStatusOverWebsocket.ONLINE
-        return PlayerStatusOverWebsocket.OFFLINE
+        return cls.get_presence_many([player])[player.id]
 
     @classmethod
     def get_player_channel_name(cls, player: Optional[Player]) -> Optional[str]:
@@ -86,3 +153,58 @@ class PlayerRepository(BaseRepository):
     def delete_all_player_battle_connections_cache(cls, player: Player):
         cache_group_name = f'asgi:group:{cls.get_player_channel_name(player)}'
         redis_client.delete(cache_group_name)
+
+    @staticmethod
+    def pop_last_activity(count: int) -> dict[str, datetime]:
+        """Take up to ``count`` players recorded by ``Player.update_last_activity``"""
+        activity = redis_client.zpopmin(settings.PLAYER_ACTIVITY_REDIS_KEY, count)
+        return {
+            player_id: datetime.fromtimestamp(timestamp, tz=timezone.utc)
+            for player_id, timestamp in activity
+        }
+
+    @staticmethod
+    def save_last_activity(last_activity: dict[str, datetime]) -> None:
+        """Save last activity of the players and extend their current activity sessions"""
+        players = list(
+            Player.objects.select_related('user').filter(player_id__in=last_activity.keys())
+        )
+        for player in players:
+            player.last_activity = last_activity[player.player_id]
+        Player.objects.bulk_update(players, ['last_activity'])
+        active_players_by_day = defaultdict(list)
+        for player_id, activity in last_activity.items():
+            active_players_by_day[activity.date()].append(player_id)
+        for day, player_ids in active_players_by_day.items():
+            StatisticsRepository.add_active_players(player_ids, day)
+
+        # an activity session starts on login and lasts until the last activity
+        sessions = {
+            (player.id, player.user.last_login): player
+            for player in players
+            if player.user.last_login
+        }
+        if not sessions:
+            return
+        now = timezone.now()
+        activities = list(
+            PlayerActivity.objects.filter(
+                player_id__in={player_id for player_id, _ in sessions},
+                start_activity__in={start_activity for _, start_activity in sessions},
+            )
+        )
+        activities = [
+            activity
+            for activity in activities
+            if (activity.player_id, activity.start_activity) in sessions
+        ]
+        for activity in activities:
+            activity.end_activity = now
+            sessions.pop((activity.player_id, activity.start_activity), None)
+        PlayerActivity.objects.bulk_update(activities, ['end_activity'])
+        PlayerActivity.objects.bulk_create(
+            [
+                PlayerActivity(player=player, start_activity=start_activity, end_activity=now)
+                for (_, start_activity), player in sessions.items()
+            ]
+        )
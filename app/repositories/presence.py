@@ -0,0 +1,104 @@
+from enum import Enum
+from time import time
+from typing import Iterable
+
+from django.conf import settings
+
+from app.redis_client import redis_client
+
+
+class PresencePlace(str, Enum):
+    LOBBY = 'lobby'
+    BATTLE = 'battle'
+
+
+class PresenceRepository:
+    """
+    Connected users by place, kept by the websocket consumers.
+
+    Every place is a sorted set of user ids scored with the time their presence expires, so
+    users of crashed workers drop out after ``PRESENCE_TTL`` without a cleanup job.
+    """
+
+    @staticmethod
+    def get_key(place: PresencePlace) -> str:
+        return f'{settings.PRESENCE_REDIS_PREFIX}-{place.value}'
+
+    @classmethod
+    def add(cls, place: PresencePlace, user_id: int) -> None:
+        """Mark the user as present, also used as a heartbeat"""
+        redis_client.zadd(cls.get_key(place), {user_id: time() + settings.PRESENCE_TTL})
+
+    @staticmethod
+    def get_group_key(group_name: str) -> str:
+        """Sorted set of the channel names in a group, kept by the channel layer"""
+        return f'asgi:group:{group_name}'
+
+    @classmethod
+    def remove(cls, place: PresencePlace, user_id: int, group_name: str) -> None:
+        """Remove the user when the last connection has left the user's channel group"""
+        if not redis_client.zcard(cls.get_group_key(group_name)):
+            redis_client.zrem(cls.get_key(place), user_id)
+
+    @classmethod
+    def count(cls, place: PresencePlace) -> int:
+        key = cls.get_key(place)
+        pipeline = redis_client.pipeline()
+        pipeline.zremrangebyscore(key, '-inf', time())
+        pipeline.zcard(key)
+        _, count = pipeline.execute()
+        return count
+
+
+class FriendStatusUpdatesRepository:
+    """
+    Friend status changes waiting to be sent, one hash per lobby connection of the recipient.
+
+    Every connection of a user gets its own copy, so each of them sends the changes. A newer
+    change of the same friend replaces the older one. A user is notified only when nothing is
+    waiting for one of its connections already, so a burst of changes is sent as one message.
+    """
+
+    @staticmethod
+    def get_key(channel_name: str) -> str:
+        return f'{settings.FRIEND_STATUS_UPDATES_REDIS_PREFIX}-{channel_name}'
+
+    @classmethod
+    def get_notified_key(cls, channel_name: str) -> str:
+        return f'{cls.get_key(channel_name)}-notified'
+
+    @staticmethod
+    def _get_channel_names(user_ids: list[int]) -> dict[int, list[str]]:
+        pipeline = redis_client.pipeline(transaction=False)
+        for user_id in user_ids:
+            group_name = f'{settings.LOBBY_CONSUMER_REDIS_GROUP_PREFIX}-{user_id}'
+            pipeline.zrange(PresenceRepository.get_group_key(group_name), 0, -1)
+        return dict(zip(user_ids, pipeline.execute()))
+
+    @classmethod
+    def push(cls, user_ids: Iterable[int], player_id: str, update: str) -> list[int]:
+        """Store the update for every connection, returns users that have to be notified"""
+        channel_names = cls._get_channel_names(list(user_ids))
+        ttl = settings.FRIEND_STATUS_UPDATES_TTL
+        pipeline = redis_client.pipeline(transaction=False)
+        receivers = []
+        for user_id, user_channel_names in channel_names.items():
+            for channel_name in user_channel_names:
+                key = cls.get_key(channel_name)
+                pipeline.hset(key, player_id, update)
+                pipeline.expire(key, ttl)
+                pipeline.set(cls.get_notified_key(channel_name), 1, ex=ttl, nx=True)
+                receivers.append(user_id)
+        results = pipeline.execute()
+        return sorted({user_id for user_id, notify in zip(receivers, results[2::3]) if notify})
+
+    @classmethod
+    def pop(cls, channel_name: str) -> list[str]:
+        key = cls.get_key(channel_name)
+        # updates pushed from now on notify the connection again
+        redis_client.delete(cls.get_notified_key(channel_name))
+        pipeline = redis_client.pipeline()
+        pipeline.hvals(key)
+        pipeline.delete(key)
+        updates, _ = pipeline.execute()
+        return updates
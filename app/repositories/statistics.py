@@ -0,0 +1,95 @@
+from datetime import date, timedelta
+from enum import Enum
+from typing import Iterable
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from app.redis_client import redis_client
+
+# Changes the total ARGV[1] by ARGV[2], totals that are not counted yet are left to get_total
+INCR_TOTAL_SCRIPT = redis_client.register_script(
+    """
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return false
+    end
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+    """
+)
+
+
+class StatisticsTotal(str, Enum):
+    BATTLES = 'battles'
+    PLAYERS = 'players'
+
+
+class StatisticsRepository:
+    """
+    Counters of the global statistics kept in redis.
+
+    Lifetime totals are counted from the table once and changed by the model signals later.
+    Battles ended on a day are kept in a set of ids and players active on a day in a
+    HyperLogLog, so counting them again is harmless and days can be combined into windows.
+    """
+
+    @staticmethod
+    def get_total_key(total: StatisticsTotal) -> str:
+        return f'{settings.STATISTICS_REDIS_PREFIX}-total-{total.value}'
+
+    @staticmethod
+    def get_day_key(name: str, day: date) -> str:
+        return f'{settings.STATISTICS_REDIS_PREFIX}-{name}-{day.isoformat()}'
+
+    @classmethod
+    def get_total(cls, total: StatisticsTotal, queryset: QuerySet) -> int:
+        key = cls.get_total_key(total)
+        value = redis_client.get(key)
+        if value is None:
+            redis_client.set(key, queryset.count(), nx=True)
+            value = redis_client.get(key)
+        return int(value)
+
+    @classmethod
+    def incr_total(cls, total: StatisticsTotal, amount: int = 1) -> None:
+        INCR_TOTAL_SCRIPT(keys=[cls.get_total_key(total)], args=[amount])
+
+    @classmethod
+    def add_ended_battle(cls, battle_id: int, day: date) -> None:
+        key = cls.get_day_key('battles-ended', day)
+        pipeline = redis_client.pipeline(transaction=False)
+        pipeline.sadd(key, battle_id)
+        pipeline.expire(key, settings.STATISTICS_DAYS_TTL)
+        pipeline.execute()
+
+    @classmethod
+    def add_active_players(cls, player_ids: Iterable[str], day: date) -> None:
+        player_ids = list(player_ids)
+        if not player_ids:
+            return
+        key = cls.get_day_key('players-active', day)
+        pipeline = redis_client.pipeline(transaction=False)
+        pipeline.pfadd(key, *player_ids)
+        pipeline.expire(key, settings.STATISTICS_DAYS_TTL)
+        pipeline.execute()
+
+    @staticmethod
+    def _last_days(days: int) -> list[date]:
+        today = timezone.now().date()
+        return [today - timedelta(days=idx) for idx in range(days)]
+
+    @classmethod
+    def get_ended_battles_per_day(cls, days: int) -> dict[str, int]:
+        last_days = cls._last_days(days)
+        pipeline = redis_client.pipeline(transaction=False)
+        for day in last_days:
+            pipeline.scard(cls.get_day_key('battles-ended', day))
+        return {day.isoformat(): count for day, count in zip(last_days, pipeline.execute())}
+
+    @classmethod
+    def get_active_players_per_day(cls, days: int) -> dict[str, int]:
+        last_days = cls._last_days(days)
+        pipeline = redis_client.pipeline(transaction=False)
+        for day in last_days:
+            pipeline.pfcount(cls.get_day_key('players-active', day))
+        return {day.isoformat(): count for day, count in zip(last_days, pipeline.execute())}
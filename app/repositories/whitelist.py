@@ -0,0 +1,53 @@
+from typing import Optional
+
+from django.conf import settings
+
+from app.models.player import WhitelistWallet
+from app.redis_client import redis_client
+
+
+class WhitelistRepository:
+    """
+    Whitelisted wallets as a redis set of lowercased addresses.
+
+    The set is loaded from ``WhitelistWallet`` on the first check and dropped by the model
+    signals on every change, so membership is a single ``SISMEMBER`` instead of an ``iexact``
+    scan of the table.
+    """
+
+    #: keeps the set in redis when the whitelist is empty
+    LOADED_MARKER = ''
+
+    @staticmethod
+    def get_key() -> str:
+        return settings.WHITELIST_WALLETS_REDIS_KEY
+
+    @classmethod
+    def is_whitelisted(cls, wallet: Optional[str]) -> bool:
+        if not wallet:
+            return False
+        key = cls.get_key()
+        pipeline = redis_client.pipeline(transaction=False)
+        pipeline.exists(key)
+        pipeline.sismember(key, wallet.lower())
+        is_loaded, is_member = pipeline.execute()
+        if is_loaded:
+            return bool(is_member)
+        return wallet.lower() in cls.load()
+
+    @classmethod
+    def load(cls) -> set[str]:
+        wallets = {
+            wallet.lower() for wallet in WhitelistWallet.objects.values_list('wallet', flat=True)
+        }
+        key = cls.get_key()
+        pipeline = redis_client.pipeline()
+        pipeline.delete(key)
+        pipeline.sadd(key, cls.LOADED_MARKER, *wallets)
+        pipeline.expire(key, settings.WHITELIST_WALLETS_TTL)
+        pipeline.execute()
+        return wallets
+
+    @classmethod
+    def invalidate(cls) -> None:
+        redis_client.delete(cls.get_key())
@@ -0,0 +1,129 @@
+"""
+Serialization of the battle state stored in redis.
+
+Every payload written by a binary codec starts with a one byte schema version, legacy
+payloads are plain JSON documents and always start with ``{``, so both can be stored
+under the same key while battles written by an older release are still running.
+"""
+import json
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import msgpack
+from django.conf import settings
+
+from app.schemas import battle as schemas
+
+LEGACY_JSON_PREFIX = b'{'
+
+
+class BattleStateCodec(ABC):
+    version: Optional[int] = None
+
+    @abstractmethod
+    def encode(self, state: schemas.Battle) -> bytes:
+        pass
+
+    @abstractmethod
+    def decode(self, payload: bytes, validate: bool = False) -> schemas.Battle:
+        pass
+
+
+class JsonBattleStateCodec(BattleStateCodec):
+    """Legacy format, kept to read states written before the versioned codecs."""
+
+    def encode(self, state: schemas.Battle) -> bytes:
+        return state.json().encode()
+
+    def decode(self, payload: bytes, validate: bool = False) -> schemas.Battle:
+        if validate:
+            return schemas.Battle.parse_raw(payload)
+        return construct_battle(json.loads(payload))
+
+
+class MsgpackBattleStateCodec(BattleStateCodec):
+    version = 1
+
+    def encode(self, state: schemas.Battle) -> bytes:
+        return bytes((self.version,)) + msgpack.packb(state.dict(), use_bin_type=True)
+
+    def decode(self, payload: bytes, validate: bool = False) -> schemas.Battle:
+        data = msgpack.unpackb(payload[1:], raw=False, strict_map_key=False)
+        if validate:
+            return schemas.Battle.parse_obj(data)
+        return construct_battle(data)
+
+
+JSON_CODEC = JsonBattleStateCodec()
+VERSIONED_CODECS: dict[int, BattleStateCodec] = {
+    MsgpackBattleStateCodec.version: MsgpackBattleStateCodec(),
+}
+CODECS_BY_NAME: dict[str, BattleStateCodec] = {
+    'json': JSON_CODEC,
+    'msgpack': VERSIONED_CODECS[MsgpackBattleStateCodec.version],
+}
+
+
+def get_codec(payload: bytes) -> BattleStateCodec:
+    if payload[:1] == LEGACY_JSON_PREFIX:
+        return JSON_CODEC
+    try:
+        return VERSIONED_CODECS[payload[0]]
+    except KeyError:
+        raise ValueError(f'Unknown battle state version {payload[0]}') from None
+
+
+def encode_battle_state(state: schemas.Battle) -> bytes:
+    return CODECS_BY_NAME[settings.BATTLE_STATE_CODEC].encode(state)
+
+
+def decode_battle_state(payload: bytes, validate: bool = False) -> schemas.Battle:
+    """
+    Decode a stored battle state.
+
+    The state is written by the server only, so by default models are built without
+    validation, pass ``validate=True`` for payloads that come from elsewhere.
+    """
+    return get_codec(payload).decode(payload, validate=validate)
+
+
+def _construct_card(data: Optional[dict]) -> Optional[schemas.Card]:
+    return schemas.Card.construct(**data) if data is not None else None
+
+
+def _construct_deck(data: Optional[dict]) -> Optional[schemas.Deck]:
+    if data is None:
+        return None
+    return schemas.Deck.construct(next_card=_construct_card(data.get('next_card')))
+
+
+def _construct_tile(data: dict) -> schemas.Tile:
+    return schemas.Tile.construct(
+        id=data['id'],
+        enchantments={
+            int(enchantment_id): schemas.Enchantment.construct(**enchantment)
+            for enchantment_id, enchantment in data.get('enchantments', {}).items()
+        },
+    )
+
+
+def _construct_battle_player(data: dict) -> schemas.BattlePlayer:
+    return schemas.BattlePlayer.construct(
+        id=data['id'],
+        deck=_construct_deck(data.get('deck')),
+        tiles={int(tile_id): _construct_tile(tile) for tile_id, tile in data['tiles'].items()},
+    )
+
+
+def construct_battle(data: dict) -> schemas.Battle:
+    """Build ``schemas.Battle`` from trusted data skipping pydantic validation."""
+    fields = {
+        'players': {
+            int(player_id): _construct_battle_player(player)
+            for player_id, player in data['players'].items()
+        }
+    }
+    for field_name in ('round_started_at', 'last_battle_card_id'):
+        if field_name in data:
+            fields[field_name] = data[field_name]
+    return schemas.Battle.construct(**fields)
@@ -1,5 +1,5 @@
 from abc import ABC
-from typing import Union
+from typing import Optional, Union
 
 from pydantic import BaseModel
 
@@ -56,11 +56,22 @@ class ChannelEventBattleAcceptMessage(ChannelEventMessageBase):
     payload: InfoBattleAcceptPayload
 
 
+class ChannelPlayerRefreshMessagePayload(BaseModel):
+    fields: list[str]
+    #: connection that changed the player, it doesn't need to reload it
+    sender_channel_name: Optional[str] = None
+
+
+class ChannelPlayerRefreshMessage(ChannelEventMessageBase):
+    payload: ChannelPlayerRefreshMessagePayload
+
+
 ChannelEventMessageRoot = Union[
     ChannelTypeEventMessage,
     ChannelFriendshipIDMessage,
     ChannelEventBattleMessage,
     ChannelEventBattleAcceptMessage,
+    ChannelPlayerRefreshMessage,
 ]
 
 
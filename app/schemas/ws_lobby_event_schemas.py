@@ -7,6 +7,7 @@ class EventResponseType(Enum):
     FRIEND_UPDATED = 'friend.updated'
     FRIEND_CONNECTED = 'friend.connected'
     FRIEND_DISCONNECTED = 'friend.disconnected'
+    FRIENDS_STATUS_UPDATED = 'friends.status.updated'
     FRIENDSHIP_REQUEST_RECEIVE = 'friends.request.show'
     FRIENDS_REQUEST_DECLINE = 'friends.request.decline'
     FRIENDS_REQUEST_REMOVE = 'friend.remove'
@@ -41,6 +42,8 @@ class EventRequestBattleInviteType(EventRequestType):
 class ChannelEventType(Enum):
     HANDLE_UPDATE_FRIENDSHIP_LIST = 'handle_channel_update_friendship_list'
     HANDLE_CHANNEL_USER_STATUS = 'handle_channel_user_status'
+    HANDLE_FRIENDS_STATUS_UPDATES = 'handle_channel_friends_status_updates'
+    HANDLE_PLAYER_REFRESH = 'handle_channel_player_refresh'
     HANDLE_FRIENDSHIP_REQUEST_RECEIVE = 'handle_channel_friendship_request_receive'
 
     HANDLE_BATTLE_INVITE_SHOW = 'handle_channel_battle_invite_show'
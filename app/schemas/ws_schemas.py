@@ -46,6 +46,18 @@ class EventResponseFriendshipListMessage(EventResponseMessageBase):
     params: list[EventResponseFriendshipParams]
 
 
+class EventResponseFriendStatusParams(BaseModel):
+    event: EventResponseType
+    friend: EventResponseFriendshipParamsPlayer
+
+    class Config:
+        use_enum_values = True
+
+
+class EventResponseFriendsStatusMessage(EventResponseMessageBase):
+    params: list[EventResponseFriendStatusParams]
+
+
 class EventResponseFriendshipReceiveMessage(EventResponseMessageBase):
     params: list[EventResponseFriendshipParams]
 
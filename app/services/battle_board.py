@@ -0,0 +1,258 @@
+# pylint: disable=too-many-public-methods
+import threading
+import weakref
+from typing import Iterable, Optional, Union
+
+from django.db.models import Prefetch
+
+from app.models.battle import (
+    Battle,
+    BattlePlayer,
+    CardActiveMystery,
+    CardDeck,
+    CardGraveyard,
+    CardHand,
+    Enchantment,
+    EnchantmentKeywordsEnum,
+    Tile,
+)
+
+BOARD_ENCHANTMENTS_ATTR = 'board_enchantments'
+
+
+class BattleBoard:
+    """
+    Battle scoped in-memory board.
+
+    Every collection (tiles, hands, decks, graveyards, active mysteries) is loaded with a
+    single query for both players on first access and kept as an identity map, so card
+    abilities and triggers work on the same objects during one client action.
+
+    The board is read only. Card abilities write through the ORM helpers of
+    ``app.card_abilities.actions``, the save and delete signals of the board rows drop only the
+    collection that changed, see :meth:`row_changed`. Boards are indexed by the battle players
+    and cards they hold, so a signal looks up the boards of its row instead of scanning them.
+    """
+
+    _boards_by_key: dict[tuple[type, int], 'weakref.WeakSet[BattleBoard]'] = {}
+    _boards_lock = threading.Lock()
+    # boards kept on a task state are not closed, keys left by them are swept once the index
+    # has doubled since the last sweep
+    _sweep_at = 10000
+
+    COLLECTION_ATTRS = {
+        Tile: '_tiles',
+        CardHand: '_hand',
+        CardDeck: '_deck',
+        CardGraveyard: '_graveyard',
+        CardActiveMystery: '_active_mysteries',
+    }
+
+    def __init__(self, battle: Battle):
+        self.battle = battle
+        self._tiles: Optional[dict[int, Tile]] = None
+        self._hand: Optional[dict[int, CardHand]] = None
+        self._deck: Optional[dict[int, CardDeck]] = None
+        self._graveyard: Optional[dict[int, CardGraveyard]] = None
+        self._active_mysteries: Optional[dict[int, CardActiveMystery]] = None
+        self._player_ids: Optional[set[int]] = None
+        self._keys: set[tuple[type, int]] = set()
+
+    @classmethod
+    def for_state(cls, state) -> 'BattleBoard':
+        """Board of the consumer that runs the action, or one kept on the state (tasks)."""
+        consumer = getattr(state, 'consumer', None)
+        if consumer is not None and hasattr(consumer, 'board'):
+            return consumer.board
+        board = getattr(state, 'board', None)
+        if board is None:
+            board = cls(state.player.battle)
+            state.board = board
+        return board
+
+    def _register(self, model: type, ids: Iterable[int]) -> None:
+        keys = {(model, obj_id) for obj_id in ids} - self._keys
+        with self._boards_lock:
+            if len(self._boards_by_key) > BattleBoard._sweep_at:
+                for key, boards in list(self._boards_by_key.items()):
+                    if not boards:
+                        del self._boards_by_key[key]
+                BattleBoard._sweep_at = max(10000, 2 * len(self._boards_by_key))
+            for key in keys:
+                self._boards_by_key.setdefault(key, weakref.WeakSet()).add(self)
+        self._keys |= keys
+
+    def close(self) -> None:
+        """Stop following changes of the battle rows, the board is not used anymore"""
+        with self._boards_lock:
+            for key in self._keys:
+                boards = self._boards_by_key.get(key)
+                if boards is not None:
+                    boards.discard(self)
+                    if not boards:
+                        del self._boards_by_key[key]
+        self._keys = set()
+
+    # loading
+
+    def _load(self, queryset) -> dict:
+        if self._player_ids is None:
+            self._player_ids = set(
+                BattlePlayer.objects.filter(battle_id=self.battle.id).values_list('id', flat=True)
+            )
+            self._register(BattlePlayer, self._player_ids)
+        objects = {obj.id: obj for obj in queryset.filter(player_id__in=self._player_ids)}
+        if queryset.model in (Tile, CardHand):
+            # enchantment changes are matched by the card they belong to
+            self._register(queryset.model, objects)
+        return objects
+
+    @staticmethod
+    def _enchantments_prefetch() -> Prefetch:
+        return Prefetch(
+            'enchantments', queryset=Enchantment.objects.all(), to_attr=BOARD_ENCHANTMENTS_ATTR
+        )
+
+    @property
+    def _tiles_map(self) -> dict[int, Tile]:
+        if self._tiles is None:
+            self._tiles = self._load(
+                Tile.objects.select_related('card', 'original_card', 'player').prefetch_related(
+                    self._enchantments_prefetch()
+                )
+            )
+        return self._tiles
+
+    @property
+    def _hand_map(self) -> dict[int, CardHand]:
+        if self._hand is None:
+            self._hand = self._load(
+                CardHand.objects.select_related('card', 'player').prefetch_related(
+                    self._enchantments_prefetch()
+                )
+            )
+        return self._hand
+
+    @property
+    def _deck_map(self) -> dict[int, CardDeck]:
+        if self._deck is None:
+            self._deck = self._load(CardDeck.objects.select_related('card', 'player'))
+        return self._deck
+
+    @property
+    def _graveyard_map(self) -> dict[int, CardGraveyard]:
+        if self._graveyard is None:
+            self._graveyard = self._load(CardGraveyard.objects.select_related('card', 'player'))
+        return self._graveyard
+
+    @property
+    def _active_mysteries_map(self) -> dict[int, CardActiveMystery]:
+        if self._active_mysteries is None:
+            self._active_mysteries = self._load(
+                CardActiveMystery.objects.select_related('card', 'player')
+            )
+        return self._active_mysteries
+
+    def invalidate(self) -> None:
+        """Drop loaded collections, they are reloaded on the next access."""
+        for attr in self.COLLECTION_ATTRS.values():
+            setattr(self, attr, None)
+
+    def _row_changed(self, instance) -> None:
+        if isinstance(instance, Enchantment):
+            # enchantments are prefetched onto the cards they belong to
+            if self._tiles is not None and instance.tile_id in self._tiles:
+                self._tiles = None
+            if self._hand is not None and instance.card_hand_id in self._hand:
+                self._hand = None
+        elif instance.player_id in self._player_ids:
+            setattr(self, self.COLLECTION_ATTRS[type(instance)], None)
+
+    @classmethod
+    def row_changed(cls, instance) -> None:
+        """Drop the collection holding a saved or deleted row from boards of its battle"""
+        if not cls._boards_by_key:
+            return
+        if isinstance(instance, Enchantment):
+            keys = [(Tile, instance.tile_id), (CardHand, instance.card_hand_id)]
+        else:
+            keys = [(BattlePlayer, instance.player_id)]
+        with cls._boards_lock:
+            boards = {board for key in keys for board in cls._boards_by_key.get(key, ())}
+        for board in boards:
+            board._row_changed(instance)  # pylint: disable=protected-access
+
+    # queries
+
+    @staticmethod
+    def _of_player(objects: Iterable, player: BattlePlayer) -> list:
+        return sorted(
+            (obj for obj in objects if obj.player_id == player.id), key=lambda obj: obj.order
+        )
+
+    def get_tile(self, tile_id: int) -> Optional[Tile]:
+        return self._tiles_map.get(tile_id)
+
+    def get_hand_card(self, hand_card_id: int) -> Optional[CardHand]:
+        return self._hand_map.get(hand_card_id)
+
+    def tiles(
+        self,
+        player: BattlePlayer,
+        *,
+        non_free: bool = False,
+        exclude_mia: bool = False,
+        exclude_censor: bool = False,
+        card_type: Optional[str] = None,
+        exclude_ids: Iterable[int] = (),
+    ) -> list[Tile]:
+        """In-memory equivalent of ``player.tile.non_free().exclude_mia().exclude_censor()``"""
+        exclude_ids = set(exclude_ids)
+        tiles = []
+        for tile in self._of_player(self._tiles_map.values(), player):
+            if tile.id in exclude_ids:
+                continue
+            if non_free and tile.state == Tile.States.FREE:
+                continue
+            if exclude_mia and self.has_keyword(tile, EnchantmentKeywordsEnum.mia):
+                continue
+            if exclude_censor and self.has_keyword(tile, EnchantmentKeywordsEnum.censor):
+                continue
+            if card_type is not None and (tile.card is None or tile.card.type != card_type):
+                continue
+            tiles.append(tile)
+        return tiles
+
+    def hand(self, player: BattlePlayer) -> list[CardHand]:
+        return self._of_player(self._hand_map.values(), player)
+
+    def deck(self, player: BattlePlayer) -> list[CardDeck]:
+        return self._of_player(self._deck_map.values(), player)
+
+    def graveyard(self, player: BattlePlayer) -> list[CardGraveyard]:
+        return self._of_player(self._graveyard_map.values(), player)
+
+    def active_mysteries(self, player: BattlePlayer) -> list[CardActiveMystery]:
+        return self._of_player(self._active_mysteries_map.values(), player)
+
+    @staticmethod
+    def enchantments(target: Union[Tile, CardHand]) -> list[Enchantment]:
+        return getattr(target, BOARD_ENCHANTMENTS_ATTR, [])
+
+    def has_keyword(self, target: Union[Tile, CardHand], keyword: str) -> bool:
+        return any(enchantment.keyword == keyword for enchantment in self.enchantments(target))
+
+    def attack_change_of(self, target: Union[Tile, CardHand]) -> int:
+        return sum(enchantment.attack_total_change for enchantment in self.enchantments(target))
+
+    def hp_change_of(self, target: Union[Tile, CardHand]) -> int:
+        return sum(enchantment.hp_total_change for enchantment in self.enchantments(target))
+
+    def attack_of(self, target: Union[Tile, CardHand]) -> int:
+        """Attack with enchantments, without touching the database"""
+        attack = target.attack + self.attack_change_of(target)
+        return max(0, attack) if isinstance(target, Tile) else attack
+
+    def hp_of(self, target: Union[Tile, CardHand]) -> int:
+        """HP with enchantments, without touching the database"""
+        return target.hp + self.hp_change_of(target)
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from app.models.battle import BattleLogMongo, generate_random_id
+
+logger = logging.getLogger()
+
+
+class BattleLogBuffer:
+    """
+    Write-behind buffer of battle log entries for the consumers of one worker process.
+
+    Entries are written to mongo with a single ``insert_many`` once ``batch_size`` entries are
+    collected or ``flush_interval`` seconds after the first buffered one. When writes can't keep
+    up and ``max_size`` entries are waiting, producers wait for the running write.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_size: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self._documents: list[dict] = []
+        self._lock: Optional[asyncio.Lock] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def add(self, battle_id, battle_player_id, event_type: str, content: dict) -> None:
+        if len(self._documents) >= self.max_size:
+            await self.flush()
+        self._documents.append(
+            {
+                'id': generate_random_id(),
+                'timestamp': timezone.now(),
+                'battle_id': str(battle_id),
+                'battle_player_id': str(battle_player_id),
+                'event_type': event_type,
+                'event_json': content,
+            }
+        )
+        if len(self._documents) >= self.batch_size:
+            asyncio.ensure_future(self.flush())
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.flush_interval, lambda: asyncio.ensure_future(self.flush())
+            )
+
+    async def flush(self) -> None:
+        async with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            documents, self._documents = self._documents, []
+            if not documents:
+                return
+            try:
+                await sync_to_async(self._insert_many, thread_sensitive=False)(documents)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Failed to save %s battle log entries', len(documents))
+
+    @staticmethod
+    def _insert_many(documents: list[dict]) -> None:
+        # write with pymongo directly, djongo would translate every entry into its own INSERT
+        connection = connections[BattleLogMongo._meta.in_db]
+        connection.ensure_connection()
+        collection = connection.connection[BattleLogMongo._meta.db_table]
+        collection.insert_many(documents, ordered=False)
+
+
+battle_log_buffer = BattleLogBuffer(
+    batch_size=settings.BATTLE_LOG_BATCH_SIZE,
+    flush_interval=settings.BATTLE_LOG_FLUSH_INTERVAL,
+    max_size=settings.BATTLE_LOG_MAX_BUFFER_SIZE,
+)
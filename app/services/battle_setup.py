@@ -0,0 +1,73 @@
+import random
+
+from app.models.battle import Battle, BattlePlayer, CardDeck, CardHand, Tile
+from app.models.card import Card
+from app.repositories.battle import BattleRepository
+from app.repositories.card import CardRepository
+from app.repositories.deck import DeckRepository
+from app.schemas import battle as schemas
+
+
+class BattleSetup:
+    """
+    Creates decks, starting hands and tiles of a starting battle.
+
+    Decks are shuffled in memory and the starting hand is taken from the top before anything is
+    written, so every table gets one ``bulk_create`` per player. Battle card ids are reserved
+    in one call per player, the redis state is changed in memory and saved by the caller.
+    """
+
+    def __init__(self, battle: Battle, state: schemas.Battle):
+        self.battle = battle
+        self.state = state
+        self.game_mode = battle.game_mode
+
+    def setup_player(self, battle_player: BattlePlayer, tiles_count: int) -> None:
+        cards = self._get_deck_cards(battle_player)
+        battle_card_ids = BattleRepository.reserve_card_ids(self.battle, len(cards))
+        cards = list(zip(cards, battle_card_ids))
+        hand_count = self.game_mode.start_cards_on_hand_count
+        # the hand is drawn from the top of the deck, it can be smaller for short decks
+        hand_cards, deck_cards = cards[:hand_count], cards[hand_count:]
+
+        CardDeck.objects.bulk_create(
+            [
+                CardDeck(
+                    card=card,
+                    player=battle_player,
+                    order=order,
+                    battle_card_id=battle_card_id,
+                    hp=card.hp,
+                    attack=card.attack,
+                )
+                for order, (card, battle_card_id) in enumerate(deck_cards, start=hand_count)
+            ]
+        )
+        CardHand.objects.bulk_create(
+            [
+                CardHand(
+                    card=card,
+                    player=battle_player,
+                    order=order,
+                    battle_card_id=battle_card_id,
+                    hp=card.hp,
+                    attack=card.attack,
+                )
+                for order, (card, battle_card_id) in enumerate(hand_cards, start=1)
+            ]
+        )
+        tiles_count = min(tiles_count, self.game_mode.max_tiles_per_player)
+        tiles = Tile.objects.bulk_create(
+            [Tile(player=battle_player, order=order) for order in range(1, tiles_count + 1)]
+        )
+        player_state = self.state.players[battle_player.player.id]
+        for tile in tiles:
+            player_state.tiles[tile.id] = schemas.Tile(id=tile.id)
+
+    def _get_deck_cards(self, battle_player: BattlePlayer) -> list[Card]:
+        if self.game_mode.is_random_generated_deck:
+            return CardRepository.get_random_cards(self.game_mode, self.game_mode.max_cards_in_deck)
+        deck = DeckRepository.get_player_selected_deck(battle_player.player)
+        cards = list(Card.objects.filter(card_to_custom_deck__deck=deck))
+        random.shuffle(cards)
+        return cards
@@ -0,0 +1,151 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+
+from app.models.battle import Battle
+from app.models.game_mode import (
+    PlayerBattleStats,
+    PlayerSeasonStats,
+    SkillPointsForBattlePlayer,
+    SkillPointsLadder,
+)
+
+
+class BattleStatsProcessor:
+    """
+    Applies results of a batch of completed battles.
+
+    Battle counters of the players are changed with one ``F()`` update per player and season,
+    season stats of all players in the batch are loaded and written with bulk queries. Battles
+    are applied in the order they ended so level ups happen as they would one by one, and are
+    marked so a battle pushed twice is counted once. Cached player statistics are dropped and
+    read from ``PlayerBattleStats`` again.
+    """
+
+    def __init__(self, battle_ids: list[int]):
+        self.battle_ids = battle_ids
+
+    def _load_battles(self) -> list[Battle]:
+        return list(
+            Battle.objects.filter(id__in=self.battle_ids, stats_applied=False)
+            .exclude(winner=None)
+            # battles applied before stats_applied existed, they are marked by the backfill
+            .exclude(Exists(SkillPointsForBattlePlayer.objects.filter(battle=OuterRef('pk'))))
+            .select_for_update(of=('self',))
+            .select_related('game_mode_season')
+            .prefetch_related('players__player')
+            .order_by('battle_end', 'id')
+        )
+
+    @staticmethod
+    def _load_ladders(battles: list[Battle]) -> dict[int, dict[int, SkillPointsLadder]]:
+        game_mode_ids = {battle.game_mode_season.game_mode_id for battle in battles}
+        ladders = defaultdict(dict)
+        for level in SkillPointsLadder.objects.filter(game_mode_id__in=game_mode_ids):
+            ladders[level.game_mode_id][level.level] = level
+        return ladders
+
+    @staticmethod
+    def _load_season_stats(
+        pairs: set[tuple[int, int]]
+    ) -> dict[tuple[int, int], PlayerSeasonStats]:
+        season_stats = {}
+        # rows are locked in id order, so batches sharing players wait instead of overwriting
+        # each other's skill points
+        stats = (
+            PlayerSeasonStats.objects.select_for_update()
+            .filter(
+                player_id__in={player_id for player_id, _ in pairs},
+                season_id__in={season_id for _, season_id in pairs},
+            )
+            .order_by('id')
+        )
+        for player_season in stats:
+            key = (player_season.player_id, player_season.season_id)
+            if key in pairs:
+                season_stats.setdefault(key, player_season)
+        missing = [
+            PlayerSeasonStats(player_id=player_id, season_id=season_id)
+            for player_id, season_id in pairs - set(season_stats)
+        ]
+        for player_season in PlayerSeasonStats.objects.bulk_create(missing):
+            season_stats[(player_season.player_id, player_season.season_id)] = player_season
+        return season_stats
+
+    def process(self) -> int:
+        """Returns the number of battles applied"""
+        with transaction.atomic():
+            battles = self._load_battles()
+            self._apply_battle_stats(battles)
+            self._apply_skill_points([battle for battle in battles if battle.game_mode_season_id])
+            Battle.objects.filter(id__in=[battle.id for battle in battles]).update(
+                stats_applied=True
+            )
+
+        cache_keys = set()
+        for battle in battles:
+            for battle_player in battle.players.all():
+                cache_key = f'user_statistics_{battle_player.player.user_id}'
+                cache_keys.add(cache_key)
+                if battle.game_mode_season_id:
+                    cache_keys.add(f'{cache_key}_season_{battle.game_mode_season_id}')
+        cache.delete_many(list(cache_keys))
+        return len(battles)
+
+    @staticmethod
+    def _apply_battle_stats(battles: list[Battle]) -> None:
+        # (player id, season id or None for all battles) -> battles, wins, losses
+        deltas = defaultdict(lambda: [0, 0, 0])
+        for battle in battles:
+            for battle_player in battle.players.all():
+                is_winner = battle_player.player_id == battle.winner_id
+                for season_id in {None, battle.game_mode_season_id}:
+                    delta = deltas[(battle_player.player_id, season_id)]
+                    delta[0] += 1
+                    delta[1 if is_winner else 2] += 1
+        PlayerBattleStats.objects.bulk_create(
+            [
+                PlayerBattleStats(player_id=player_id, season_id=season_id)
+                for player_id, season_id in deltas
+            ],
+            ignore_conflicts=True,
+        )
+        for (player_id, season_id), (battles_count, wins_count, losses_count) in deltas.items():
+            PlayerBattleStats.objects.filter(player_id=player_id, season_id=season_id).update(
+                battles_count=F('battles_count') + battles_count,
+                wins_count=F('wins_count') + wins_count,
+                losses_count=F('losses_count') + losses_count,
+            )
+
+    def _apply_skill_points(self, battles: list[Battle]) -> None:
+        if not battles:
+            return
+        ladders = self._load_ladders(battles)
+        season_stats = self._load_season_stats(
+            {
+                (battle_player.player_id, battle.game_mode_season_id)
+                for battle in battles
+                for battle_player in battle.players.all()
+            }
+        )
+        skill_points = []
+        for battle in battles:
+            ladder = ladders[battle.game_mode_season.game_mode_id]
+            for battle_player in battle.players.all():
+                player_season = season_stats[(battle_player.player_id, battle.game_mode_season_id)]
+                is_winner = battle_player.player_id == battle.winner_id
+                skill_points.append(
+                    SkillPointsForBattlePlayer(
+                        battle=battle,
+                        player_id=battle_player.player_id,
+                        skill_points=player_season.apply_battle_result(is_winner, ladder),
+                    )
+                )
+        PlayerSeasonStats.objects.bulk_update(
+            list(season_stats.values()),
+            ['skill_points', 'skill_level', 'xp_earned'],
+            batch_size=1000,
+        )
+        SkillPointsForBattlePlayer.objects.bulk_create(skill_points, batch_size=1000)
@@ -0,0 +1,146 @@
+from typing import Callable, Iterable
+
+from app.battle_service import get_card_behavior
+from app.card_abilities.registry import CardAbilityRegistry, CardCapability
+from app.enums.card import CardTypesEnum
+from app.models.battle import CardRelation, EnchantmentKeywordsEnum, Tile
+from app.utils.battle_consumer_utils import BattleServerEventsEnum, ServerEventData, get_state
+
+
+def can_react(card_relation: CardRelation, capability: CardCapability) -> bool:
+    card = card_relation.card
+    return card is not None and CardAbilityRegistry.has(card.custom_id, capability)
+
+
+def listening(cards: Iterable, capability: CardCapability) -> list:
+    """Cards whose behavior implements the listener, the rest would only run a no-op"""
+    return [card_relation for card_relation in cards if can_react(card_relation, capability)]
+
+
+class TriggerDispatcher:
+    """
+    Runs card triggers for the events stored by a battle consumer.
+
+    Listeners are indexed by event name, events nobody listens to are skipped without
+    loading the state or the board. Events stored while triggers run (deaths causing deaths)
+    are handled at once, depth first, like the nested ``store_event`` calls they come from.
+    The state is loaded for the first event of the chain and shared by the nested ones, the
+    board drops only collections whose rows were changed by the triggers.
+    """
+
+    LISTENERS: dict[str, tuple[str, ...]] = {
+        'avatar_damage': ('on_avatar_damage',),
+        'move_card_from_hand_to_tile': ('on_creature_play',),
+        'mia_enchantment_removed': ('on_awake_from_mia',),
+        BattleServerEventsEnum.tile_card_death: ('on_creature_death',),
+        BattleServerEventsEnum.spell_card_played: ('on_spell_card_played',),
+    }
+
+    def __init__(self, consumer):
+        self.consumer = consumer
+        self._state = None
+
+    def _listeners(self, event: ServerEventData) -> list[Callable]:
+        return [getattr(self, name) for name in self.LISTENERS.get(event.event, ())]
+
+    def dispatch(self, event: ServerEventData) -> None:
+        listeners = self._listeners(event)
+        if not listeners:
+            return
+        is_outermost = self._state is None
+        if is_outermost:
+            self._state = get_state(self.consumer.battle, self.consumer.player_id, self.consumer)
+        try:
+            for listener in listeners:
+                listener(self._state, event)
+        finally:
+            if is_outermost:
+                self._state = None
+
+    @property
+    def board(self):
+        return self.consumer.board
+
+    def _friendly_tiles(self, player, exclude_ids=()) -> list[Tile]:
+        return self.board.tiles(
+            player, non_free=True, exclude_mia=True, exclude_censor=True, exclude_ids=exclude_ids
+        )
+
+    def on_avatar_damage(self, state, event: ServerEventData) -> None:
+        # check friendly avatar damage
+        if event.params['target_avatar'] != 'player' or not event.to_opponent_only:
+            return
+        active_mysteries = listening(
+            self.board.active_mysteries(state.enemy), CardCapability.ON_PLAYER_AVATAR_DAMAGE
+        )
+        for active_mystery in active_mysteries:
+            behavior = get_card_behavior(active_mystery)
+            behavior.on_player_avatar_damage(
+                state, active_mystery, state.player, damage=event.params['damage']
+            )
+
+    def on_creature_play(self, state, event: ServerEventData) -> None:
+        tile = self.board.get_tile(event.params['tile_id'])
+        if (
+            not tile
+            or tile.player_id != state.player.id
+            or self.board.has_keyword(tile, EnchantmentKeywordsEnum.mia)
+        ):
+            return
+        active_mysteries = listening(
+            self.board.active_mysteries(state.enemy), CardCapability.ON_OPPONENT_CREATURE_PLAY
+        )
+        for active_mystery in active_mysteries:
+            behavior = get_card_behavior(active_mystery)
+            behavior.on_opponent_creature_play(state, active_mystery, tile)
+        # stored on the card from its description, scripted cards have no behavior class
+        if (tile.card and tile.card.has_warcry) or (
+            tile.original_card and tile.original_card.has_warcry
+        ):
+            friendly_tiles = listening(
+                self._friendly_tiles(state.player, exclude_ids=[tile.id]),
+                CardCapability.ON_PLAY_FRIENDLY_CREATURE_WITH_WARCRY,
+            )
+            for friendly_tile in friendly_tiles:
+                behavior = get_card_behavior(friendly_tile)
+                behavior.on_play_friendly_creature_with_warcry(state, friendly_tile)
+
+    def on_awake_from_mia(self, state, event: ServerEventData) -> None:
+        tile = self.board.get_tile(event.params['tile_id'])
+        if not can_react(tile, CardCapability.ON_AWAKE_FROM_MIA):
+            return
+        behavior = get_card_behavior(tile)
+        behavior.on_awake_from_mia(state, tile)
+
+    def on_creature_death(self, state, event: ServerEventData) -> None:
+        dead_tile = self.board.get_tile(event.params['tile_id'])
+        tile_battle_player = dead_tile.player
+        if dead_tile.card.type == CardTypesEnum.serf:
+            active_mysteries = listening(
+                self.board.active_mysteries(tile_battle_player),
+                CardCapability.ON_FRIENDLY_CREATURE_DEATH,
+            )
+            for active_mystery in active_mysteries:
+                behavior = get_card_behavior(active_mystery)
+                behavior.on_friendly_creature_death(state, active_mystery, dead_tile.card)
+        tiles = listening(
+            self._friendly_tiles(tile_battle_player, exclude_ids=[dead_tile.id]),
+            CardCapability.ON_FRIENDLY_CREATURE_DEATH,
+        )
+        for tile in tiles:
+            behavior = get_card_behavior(tile)
+            behavior.on_friendly_creature_death(state, tile)
+
+    def on_spell_card_played(self, state, event: ServerEventData) -> None:
+        if event.to_opponent_only:
+            return
+        hand_card_id = event.params['card_hand']['id']
+        spell_hand_card = self.board.get_hand_card(hand_card_id)
+        if not spell_hand_card or spell_hand_card.player_id != state.player.id:
+            return
+        tiles = listening(
+            self._friendly_tiles(state.player), CardCapability.ON_ANY_SPELL_CARD_PLAYED
+        )
+        for tile in tiles:
+            behavior = get_card_behavior(tile)
+            behavior.on_any_spell_card_played(state, hand_card_id, tile)
@@ -1,19 +1,19 @@
 # pylint: disable=too-many-lines
-import datetime
 import logging
 from datetime import timedelta
 from typing import List, Optional
+from uuid import uuid4
 
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from django.conf import settings
 from django.core.cache import cache
+from django.db.models import Count, Q
 from django.utils import timezone
 
-from app.repositories.base import BaseRepository
-from app.repositories.deck import DeckRepository
+from app.redis_client import redis_client
 from app.repositories.player import PlayerRepository
-from app.repositories.tile import TileRepository
+from app.repositories.presence import PresencePlace, PresenceRepository
 from django_app.celery import app
 from utils.download_full_bodies import download_full_bodies
 from utils.resize_full_bodies import resize_full_bodies
@@ -22,13 +22,15 @@ from utils.upload_full_bodies import upload_full_bodies
 from .models.battle import Battle, BattleLogMongo
 from .models.cache import CachingTime
 from .models.card import Card
-from .models.player import Player, PlayerActivity, PlayerCard
+from .models.player import Player, PlayerCard
 from .models.stats import ActivePlayersOverTime
-from .redis_client import redis_client
 from .repositories.battle import BattleRepository
 from .repositories.battle_player import BattlePlayerRepository
-from .repositories.card import CardRepository
-from .repositories.game_mode import GameModeRepository
+from .repositories.battle_stats import BattleStatsQueueRepository
+from .repositories.battle_timer import BattleTimerKind, BattleTimerRepository
+from .repositories.statistics import StatisticsRepository, StatisticsTotal
+from .services.battle_setup import BattleSetup
+from .services.battle_stats import BattleStatsProcessor
 from .utils.nft import NFTCard, get_nft_cards
 
 logger = logging.getLogger(__name__)
@@ -145,11 +147,11 @@ def end_turn_timer(
     battle = Battle.objects.get(id=battle_id)
     battle_state = battle.state not in (Battle.States.ACTIVE, Battle.States.AWAITING_RECONNECT)
     if battle.turn != turn_idx or battle.turn_number != turn_number or battle_state:
+        BattleTimerRepository.count_stale_fire(BattleTimerKind.END_TURN)
         return
-    player = Player.objects.get(id=player_id)
-    player_channel_name = PlayerRepository.get_player_channel_name(player)
-    opponent = Player.objects.get(id=opponent_id)
-    opponent_channel_name = PlayerRepository.get_player_channel_name(opponent)
+    players = Player.objects.in_bulk([player_id, opponent_id])
+    player_channel_name = PlayerRepository.get_player_channel_name(players[player_id])
+    opponent_channel_name = PlayerRepository.get_player_channel_name(players[opponent_id])
 
     layer = get_channel_layer()
     if player_channel_name:
@@ -202,15 +204,16 @@ def start_battle_countdown(
         battle_player = BattlePlayerRepository.get(player_id, battle)
         opponent_battle_player = BattlePlayerRepository.get(opponent_id, battle)
 
-        next_card_in_deck(
-            battle=battle,
-            player=battle_player,
-        )
-        next_card_in_deck(
-            battle=battle,
-            player=opponent_battle_player,
-        )
-        battle_state_in_redis = BattleRepository.get_state_from_redis(battle)
+        with BattleRepository.unit_of_work(battle):
+            next_card_in_deck(
+                battle=battle,
+                player=battle_player,
+            )
+            next_card_in_deck(
+                battle=battle,
+                player=opponent_battle_player,
+            )
+            battle_state_in_redis = BattleRepository.get_state_from_redis(battle)
         player_next_card = battle_state_in_redis.players[player_id].deck.next_card
         enemy_next_card = battle_state_in_redis.players[opponent_id].deck.next_card
 
@@ -232,26 +235,18 @@ def start_battle_countdown(
 
 @app.task
 def update_last_activity():
-    all_keys_in_cache = cache.keys('*')
-    for iter_keys in all_keys_in_cache:
-        if iter_keys.startswith('last_activity-'):
-            last_activity_data = cache.get(iter_keys)
-            player_id = iter_keys.split('-')[-1]
-            player = Player.objects.get(player_id=player_id)
-            player.last_activity = last_activity_data
-            player.save()
-            PlayerActivity.objects.update_or_create(
-                player=player,
-                start_activity=player.user.last_login,
-                defaults={'end_activity': timezone.now()},
-            )
+    while True:
+        last_activity = PlayerRepository.pop_last_activity(settings.PLAYER_ACTIVITY_BATCH_SIZE)
+        if not last_activity:
+            break
+        PlayerRepository.save_last_activity(last_activity)
+        if len(last_activity) < settings.PLAYER_ACTIVITY_BATCH_SIZE:
+            break
 
 
 @app.task
 def update_global_statistics():
     logger.debug('Updating global statistics...')
-    player_queryset = Player.objects
-    battle_queryset = Battle.objects
     caching_time_row = CachingTime.objects.first()
     caching_time = (
         caching_time_row.global_statistics
@@ -259,43 +254,44 @@ def update_global_statistics():
         else settings.GLOBAL_STATISTICS_DEFAULT_CACHE_TIME
     )
 
-    online_players_count = 0
-    cursor = 0
-
-    while True:
-        cursor, results = redis_client.scan(
-            cursor, f'asgi:group:{settings.LOBBY_CONSUMER_REDIS_GROUP_PREFIX}-*', 1000
-        )
-        online_players_count += len(results)
-        if not cursor:
-            break
+    online_players_count = PresenceRepository.count(PresencePlace.LOBBY)
+    now = timezone.now()
+    windows = {
+        'last_30_days': now - timedelta(days=30),
+        'last_7_days': now - timedelta(days=7),
+        'today': now - timedelta(days=1),
+    }
+    battles = Battle.objects.filter(
+        Q(battle_end__gte=windows['last_30_days']) | Q(state__in=Battle.States.active_states())
+    ).aggregate(
+        **{
+            name: Count('id', filter=Q(battle_end__gte=since))
+            for name, since in windows.items()
+        },
+        active=Count('id', filter=Q(state__in=Battle.States.active_states())),
+    )
+    players = Player.objects.filter(last_activity__gte=windows['last_30_days']).aggregate(
+        **{
+            name: Count('id', filter=Q(last_activity__gte=since))
+            for name, since in windows.items()
+        }
+    )
 
     statistic = {
         'battles': {
-            'all_time': battle_queryset.count(),
-            'last_30_days': battle_queryset.filter(
-                battle_end__gte=datetime.datetime.now() - timedelta(days=30)
-            ).count(),
-            'last_7_days': battle_queryset.filter(
-                battle_end__gte=datetime.datetime.now() - timedelta(days=7)
-            ).count(),
-            'today': battle_queryset.filter(
-                battle_end__gte=datetime.datetime.now() - timedelta(days=1)
-            ).count(),
-            'active': battle_queryset.filter(state__in=Battle.States.active_states()).count(),
+            'all_time': StatisticsRepository.get_total(StatisticsTotal.BATTLES, Battle.objects),
+            **battles,
+            'ended_per_day': StatisticsRepository.get_ended_battles_per_day(7),
         },
         'players': {
-            'all_time': player_queryset.count(),
-            'last_30_days': player_queryset.filter(
-                last_activity__gte=datetime.datetime.now() - timedelta(days=30)
-            ).count(),
-            'last_7_days': player_queryset.filter(
-                last_activity__gte=datetime.datetime.now() - timedelta(days=7)
-            ).count(),
-            'today': player_queryset.filter(
-                last_activity__gte=datetime.datetime.now() - timedelta(days=1)
-            ).count(),
+            'all_time': StatisticsRepository.get_total(StatisticsTotal.PLAYERS, Player.objects),
+            **players,
             'online': online_players_count,
+            'active_per_day': StatisticsRepository.get_active_players_per_day(7),
+        },
+        'battle_timers': {
+            'scheduled': BattleTimerRepository.count_scheduled(),
+            'stale_fires': BattleTimerRepository.get_stale_fires(),
         },
     }
 
@@ -306,12 +302,8 @@ def update_global_statistics():
 @app.task
 def record_player_stats():
     ActivePlayersOverTime.objects.create(
-        players_online=len(
-            redis_client.keys(f'asgi:group:{settings.LOBBY_CONSUMER_REDIS_GROUP_PREFIX}*')
-        ),
-        players_in_battle=len(
-            redis_client.keys(f'asgi:group:{settings.BATTLE_CONSUMER_REDIS_GROUP_PREFIX}*')
-        ),
+        players_online=PresenceRepository.count(PresencePlace.LOBBY),
+        players_in_battle=PresenceRepository.count(PresencePlace.BATTLE),
     )
 
 
@@ -325,10 +317,41 @@ def save_battle_log_to_mongo(battle_id, battle_player_id, event_type, content):
     )
 
 
+@app.task
+def process_battle_stats():
+    # a run can outlast the 10s schedule, the next one is skipped instead of overlapping
+    lock = redis_client.lock(
+        settings.BATTLE_STATS_LOCK_REDIS_KEY, timeout=settings.BATTLE_STATS_LOCK_TIMEOUT
+    )
+    if not lock.acquire(blocking=False):
+        return
+    try:
+        BattleStatsQueueRepository.requeue_abandoned()
+        batch_size = settings.BATTLE_STATS_BATCH_SIZE
+        worker_id = uuid4().hex
+        while True:
+            battle_ids = BattleStatsQueueRepository.pop(worker_id, batch_size)
+            if not battle_ids:
+                break
+            try:
+                BattleStatsProcessor(battle_ids).process()
+            except Exception:
+                BattleStatsQueueRepository.requeue(worker_id)
+                raise
+            BattleStatsQueueRepository.ack(worker_id)
+            if len(battle_ids) < batch_size:
+                break
+    finally:
+        lock.release()
+
+
 @app.task
 def battle_duration(battle_id):
     logger.info('The battle time is over')
     battle = BattleRepository.get_from_battle_id(battle_id)
+    if battle.state not in Battle.States.active_states():
+        BattleTimerRepository.count_stale_fire(BattleTimerKind.BATTLE_DURATION)
+        return
     battle_player1, battle_player2 = battle.players.all()
     get_channel_layer()
     layer = get_channel_layer()
@@ -360,63 +383,60 @@ def battle_duration(battle_id):
     BattleRepository.save(battle)
 
 
-def battle_start(  # pylint: disable=too-many-statements
+BATTLE_TIMER_HANDLERS = {
+    BattleTimerKind.END_TURN: end_turn_timer,
+    BattleTimerKind.BATTLE_DURATION: battle_duration,
+}
+
+
+@app.task
+def fire_battle_timers():
+    """Send the battle timers that are due to their tasks, see BattleTimerRepository"""
+    batch_size = settings.BATTLE_TIMERS_BATCH_SIZE
+    while True:
+        timers = BattleTimerRepository.pop_due(batch_size)
+        for timer_id, payload in timers:
+            # every timer runs as its own task, a slow one doesn't hold back the others
+            try:
+                BATTLE_TIMER_HANDLERS[BattleTimerRepository.get_kind(timer_id)].apply_async(
+                    kwargs=payload, serializer='json'
+                )
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Battle timer %s failed', timer_id)
+        if len(timers) < batch_size:
+            break
+
+
+def battle_start(
     battle: Battle,
 ) -> None:
-    from app import battle_service  # pylint: disable=import-outside-toplevel
-
     battle.battle_start = timezone.now()
     current_turn_player = None
     opponent_player = None
-    players = battle.players.all()
-    state_redis = BattleRepository.get_state_from_redis(battle)
-    for battle_player in players:
-        if battle.game_mode.is_random_generated_deck:
-            count_cards_from_game_mode = battle.game_mode.max_cards_in_deck
-            blocked_cards = GameModeRepository.get_blocked_cards(battle.game_mode)
-            all_cards = CardRepository.get_published_cards()
-            all_cards -= blocked_cards
-            all_cards = BaseRepository.random_objects(all_cards, count_cards_from_game_mode)
-            DeckRepository.create_from_cards_list(battle_player, all_cards)
-        else:
-            deck = DeckRepository.get_player_selected_deck(battle_player.player)
-            DeckRepository.create_from_custom_deck(battle_player, deck)
-
-        for _ in range(battle.game_mode.start_cards_on_hand_count):
-            deck_card = DeckRepository.get_first_card(battle_player)
-            if not deck_card:
-                # can be triggered if user has less than 5 cards in deck
-                break
-            battle_service.create_last_card_in_hand(
-                hand_player=deck_card.player,
-                card=deck_card.card,
-                battle_card_id=deck_card.battle_card_id,
-            )
-            deck_card.delete()
-        TileRepository.create_from_battle_player(battle_player=battle_player, state=state_redis)
-        if battle_player.idx != battle.turn:
-            TileRepository.create_from_battle_player(battle_player=battle_player, state=state_redis)
-            opponent_player = battle_player.player
-        else:
-            current_turn_player = battle_player.player
-            battle.current_turn_player = battle_player
-    BattleRepository.set_round_started_at(state_redis)
-    BattleRepository.update_state_in_redis(battle=battle, new_state=state_redis)
-    end_turn_timer.apply_async(
-        args=(
-            battle.id,
-            battle.turn_number,
-            battle.turn,
-            current_turn_player.id if current_turn_player else None,
-            opponent_player.id if opponent_player else None,
-        ),
-        serializer='json',
-        countdown=battle.game_mode.battlefield_timer_duration,
+    players = battle.players.select_related('player')
+    with BattleRepository.unit_of_work(battle):
+        state_redis = BattleRepository.get_state_from_redis(battle)
+        battle_setup = BattleSetup(battle, state_redis)
+        for battle_player in players:
+            if battle_player.idx != battle.turn:
+                # the player moving second starts with an extra tile
+                battle_setup.setup_player(battle_player, tiles_count=2)
+                opponent_player = battle_player.player
+            else:
+                battle_setup.setup_player(battle_player, tiles_count=1)
+                current_turn_player = battle_player.player
+                battle.current_turn_player = battle_player
+        BattleRepository.set_round_started_at(state_redis)
+        BattleRepository.update_state_in_redis(battle=battle, new_state=state_redis)
+    BattleTimerRepository.schedule_end_turn(
+        battle,
+        battle.game_mode.battlefield_timer_duration,
+        player_id=current_turn_player.id if current_turn_player else None,
+        opponent_id=opponent_player.id if opponent_player else None,
     )
-    battle_duration.apply_async(
-        args=(battle.id,),
-        serializer='json',
-        countdown=battle.game_mode.battle_duration,
-        task_id=battle.room_id,
+    BattleTimerRepository.schedule(
+        BattleTimerRepository.get_timer_id(BattleTimerKind.BATTLE_DURATION, battle.id),
+        battle.game_mode.battle_duration,
+        {'battle_id': battle.id},
     )
     battle.save()
@@ -2,12 +2,16 @@
 import pytest
 from faker import Faker
 
+from app.exceptions import BattleStateConflict
 from app.models.battle import Battle
 from app.models.game_mode import GameMode
 from app.models.player import Player
 from app.models.user import User
+from app.redis_client import redis_binary_client
 from app.repositories.battle import BattleRepository
+from app.schemas import battle as schemas
 from app.schemas.battle import BattleInvite
+from app.schemas.battle_codec import MsgpackBattleStateCodec
 
 
 @pytest.fixture()
@@ -39,3 +43,89 @@ def test_battle_create(game_mode, sender_player, invited_player):
     )
     battle = BattleRepository.create_battle(game_mode, sender_player, invited_player, battle_invite)
     assert isinstance(battle, Battle)
+
+
+@pytest.fixture()
+def battle(game_mode, sender_player, invited_player) -> Battle:
+    battle_invite = BattleInvite(
+        sender_username=sender_player.user.username,
+        invited_username=invited_player.user.username,
+        game_mode_id=game_mode.id,
+    )
+    return BattleRepository.create_battle(game_mode, sender_player, invited_player, battle_invite)
+
+
+@pytest.fixture()
+def battle_state(sender_player, invited_player) -> schemas.Battle:
+    state = BattleRepository.set_battle_in_redis(sender_player.id, invited_player.id)
+    state.players[sender_player.id].tiles[1] = schemas.Tile(
+        id=1,
+        enchantments={
+            2: schemas.Enchantment(id=2, keyword='mia', type='buff', active=True),
+        },
+    )
+    state.last_battle_card_id = 10
+    return state
+
+
+def test_state_stored_in_versioned_format(battle, battle_state):
+    BattleRepository.update_state_in_redis(battle, battle_state)
+    payload = redis_binary_client.get(BattleRepository.get_key(battle))
+    assert payload[0] == MsgpackBattleStateCodec.version
+    assert BattleRepository.get_state_from_redis(battle) == battle_state
+
+
+def test_state_reads_legacy_json(battle, battle_state):
+    redis_binary_client.set(BattleRepository.get_key(battle), battle_state.json())
+    assert BattleRepository.get_state_from_redis(battle) == battle_state
+
+
+def test_unit_of_work_writes_state_once(battle, battle_state, mocker):
+    BattleRepository.update_state_in_redis(battle, battle_state)
+    update_state_in_redis = mocker.spy(BattleRepository, '_update_state_in_redis')
+    with BattleRepository.unit_of_work(battle):
+        state = BattleRepository.get_state_from_redis(battle)
+        assert BattleRepository.get_state_from_redis(battle) is state
+        state.last_battle_card_id += 1
+        BattleRepository.update_state_in_redis(battle, state)
+        state.last_battle_card_id += 1
+        BattleRepository.update_state_in_redis(battle, state)
+
+    update_state_in_redis.assert_not_called()
+    assert BattleRepository.get_state_from_redis(battle).last_battle_card_id == 12
+
+
+def test_unit_of_work_conflict(battle, battle_state):
+    BattleRepository.update_state_in_redis(battle, battle_state)
+    with pytest.raises(BattleStateConflict):
+        with BattleRepository.unit_of_work(battle):
+            state = BattleRepository.get_state_from_redis(battle)
+            BattleRepository._update_state_in_redis(battle, battle_state)
+            BattleRepository.update_state_in_redis(battle, state)
+
+
+def test_reserve_card_ids(battle, battle_state):
+    battle_state.last_battle_card_id = 10
+    BattleRepository.update_state_in_redis(battle, battle_state)
+
+    assert BattleRepository.reserve_card_ids(battle, 3) == range(11, 14)
+    assert BattleRepository.reserve_card_ids(battle) == range(14, 15)
+    assert BattleRepository.get_last_card_id(battle) == 14
+
+    with BattleRepository.unit_of_work(battle):
+        BattleRepository.reserve_card_ids(battle, 2)
+    assert BattleRepository.get_state_from_redis(battle).last_battle_card_id == 16
+
+
+def test_card_id_counter_expires_with_state(battle, battle_state):
+    BattleRepository.update_state_in_redis(battle, battle_state)
+    BattleRepository.reserve_card_ids(battle)
+    redis_binary_client.expire(BattleRepository.get_card_id_key(battle), 10)
+
+    BattleRepository.update_state_in_redis(battle, battle_state)
+    assert redis_binary_client.ttl(BattleRepository.get_card_id_key(battle)) > 10
+
+    redis_binary_client.expire(BattleRepository.get_card_id_key(battle), 10)
+    with BattleRepository.unit_of_work(battle):
+        BattleRepository.update_state_in_redis(battle, battle_state)
+    assert redis_binary_client.ttl(BattleRepository.get_card_id_key(battle)) > 10
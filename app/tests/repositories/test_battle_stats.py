@@ -0,0 +1,164 @@
+# pylint: disable=redefined-outer-name
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from faker import Faker
+
+from app.models.battle import Battle, BattlePlayer
+from app.models.game_mode import (
+    GameMode,
+    GameModeSeason,
+    PlayerBattleStats,
+    PlayerSeasonStats,
+    SkillPointsForBattlePlayer,
+    SkillPointsLadder,
+)
+from app.models.player import Player
+from app.models.user import User
+from app.redis_client import redis_client
+from app.repositories.battle_stats import BattleStatsQueueRepository
+from app.services.battle_stats import BattleStatsProcessor
+from django_app.settings import SKILL_POINTS_ON_VICTORY
+
+
+def test_battle_stats_queue():
+    for battle_id in (1, 2, 3):
+        BattleStatsQueueRepository.push(battle_id)
+
+    assert BattleStatsQueueRepository.pop('worker', 2) == [1, 2]
+
+    assert BattleStatsQueueRepository.requeue('worker') == 2
+    assert BattleStatsQueueRepository.pop('worker', 10) == [1, 2, 3]
+    BattleStatsQueueRepository.ack('worker')
+    assert BattleStatsQueueRepository.pop('worker', 10) == []
+
+
+def test_battle_stats_queue_requeue_abandoned():
+    for battle_id in (1, 2, 3):
+        BattleStatsQueueRepository.push(battle_id)
+    assert BattleStatsQueueRepository.pop('dead', 2) == [1, 2]
+
+    # the lease of the worker is still running
+    assert BattleStatsQueueRepository.requeue_abandoned() == 0
+
+    redis_client.delete(BattleStatsQueueRepository.get_lease_key('dead'))
+    assert BattleStatsQueueRepository.requeue_abandoned() == 2
+    assert BattleStatsQueueRepository.pop('worker', 10) == [1, 2, 3]
+
+
+@pytest.fixture()
+def player(db) -> Player:  # pylint: disable=unused-argument, invalid-name
+    return Player.objects.create(user=User.objects.create(username=Faker().user_name()))
+
+
+@pytest.fixture()
+def opponent(db) -> Player:  # pylint: disable=unused-argument, invalid-name
+    return Player.objects.create(user=User.objects.create(username=Faker().user_name()))
+
+
+@pytest.fixture()
+def season(db) -> GameModeSeason:  # pylint: disable=unused-argument, invalid-name
+    game_mode = GameMode.objects.create(
+        title='test',
+        description='test',
+        battlefield_timer_duration=60,
+        default_game_mode=True,
+        earn_skill_points_in_this_mode=True,
+    )
+    SkillPointsLadder.objects.create(game_mode=game_mode, level=1, skill_points_required=0)
+    SkillPointsLadder.objects.create(
+        game_mode=game_mode, level=2, skill_points_required=2 * SKILL_POINTS_ON_VICTORY, xp_reward=5
+    )
+    return GameModeSeason.objects.create(game_mode=game_mode, starts_at=timezone.now())
+
+
+def create_battle(season, player, opponent, winner, battle_end) -> Battle:
+    battle = Battle.objects.create(
+        game_mode=season.game_mode,
+        game_mode_season=season,
+        state=Battle.States.COMPLETED,
+        winner=winner,
+        battle_end=battle_end,
+    )
+    BattlePlayer.objects.create(battle=battle, player=player, idx=BattlePlayer.PlayerId.ONE)
+    BattlePlayer.objects.create(battle=battle, player=opponent, idx=BattlePlayer.PlayerId.TWO)
+    return battle
+
+
+def test_battle_stats_processor(season, player, opponent):
+    player_season = PlayerSeasonStats.objects.create(
+        player=player, season=season, skill_points=SKILL_POINTS_ON_VICTORY
+    )
+    now = timezone.now()
+    won = create_battle(season, player, opponent, player, now - timedelta(minutes=5))
+    lost = create_battle(season, player, opponent, opponent, now)
+
+    assert BattleStatsProcessor([lost.id, won.id]).process() == 2
+
+    # the win levels the player up before the loss is applied, so the loss costs nothing
+    player_season.refresh_from_db()
+    assert player_season.skill_points == 2 * SKILL_POINTS_ON_VICTORY
+    assert player_season.skill_level == 2
+    assert player_season.xp_earned == 5
+    assert SkillPointsForBattlePlayer.objects.get(battle=lost, player=player).skill_points == 0
+    # the season row of the opponent is created
+    opponent_season = PlayerSeasonStats.objects.get(player=opponent, season=season)
+    assert opponent_season.skill_points == SKILL_POINTS_ON_VICTORY
+
+    # a battle pushed twice is applied once
+    assert BattleStatsProcessor([won.id]).process() == 0
+    player_season.refresh_from_db()
+    assert player_season.skill_points == 2 * SKILL_POINTS_ON_VICTORY
+    assert SkillPointsForBattlePlayer.objects.filter(battle=won).count() == 2
+
+
+def test_player_battle_stats(season, player, opponent):
+    now = timezone.now()
+    won = create_battle(season, player, opponent, player, now - timedelta(minutes=5))
+    BattleStatsProcessor([won.id]).process()
+
+    lifetime = PlayerBattleStats.objects.get(player=player, season=None)
+    assert (lifetime.battles_count, lifetime.wins_count, lifetime.losses_count) == (1, 1, 0)
+    assert player.battle_statistics == {'battles': 1, 'wins': 1, 'losses': 0, 'win_rate': 100}
+
+    # the cached statistics are dropped once the next battle is applied
+    lost = create_battle(season, player, opponent, opponent, now)
+    BattleStatsProcessor([lost.id]).process()
+    assert player.battle_statistics == {'battles': 2, 'wins': 1, 'losses': 1, 'win_rate': 50}
+    assert player.battle_stats_for_season(season.id)['battles'] == 2
+    assert opponent.battle_stats_for_season(season.id) == {
+        'battles': 2,
+        'wins': 1,
+        'losses': 1,
+        'win_rate': 50,
+    }
+    assert player.battle_stats_for_season(season.id + 1)['battles'] == 0
+
+
+def test_backfill_player_battle_stats(season, player, opponent):
+    now = timezone.now()
+    create_battle(season, player, opponent, player, now - timedelta(minutes=5))
+    create_battle(season, player, opponent, player, now - timedelta(minutes=4))
+    # still waiting in the queue, left to the task
+    waiting = create_battle(season, player, opponent, opponent, now - timedelta(minutes=3))
+    BattleStatsQueueRepository.push(waiting.id)
+    assert player.battle_statistics['battles'] == 0
+
+    call_command('backfill_player_battle_stats', batch_size=1)
+
+    assert player.battle_statistics == {'battles': 2, 'wins': 2, 'losses': 0, 'win_rate': 100}
+    assert opponent.battle_stats_for_season(season.id)['losses'] == 2
+    waiting.refresh_from_db()
+    assert not waiting.stats_applied
+    assert BattleStatsProcessor([waiting.id]).process() == 1
+    assert player.battle_statistics['battles'] == 3
+
+
+def test_battle_stats_processor_skips_battles_with_skill_points(season, player, opponent):
+    battle = create_battle(season, player, opponent, player, timezone.now())
+    SkillPointsForBattlePlayer.objects.create(battle=battle, player=player, skill_points=2)
+
+    assert BattleStatsProcessor([battle.id]).process() == 0
+    assert not PlayerSeasonStats.objects.filter(player=player).exists()
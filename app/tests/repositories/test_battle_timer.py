@@ -0,0 +1,32 @@
+from app.models.battle import Battle
+from app.repositories.battle_timer import BattleTimerKind, BattleTimerRepository
+
+
+def test_battle_timers():
+    end_turn = BattleTimerRepository.get_timer_id(BattleTimerKind.END_TURN, 1)
+    duration = BattleTimerRepository.get_timer_id(BattleTimerKind.BATTLE_DURATION, 1)
+    BattleTimerRepository.schedule(end_turn, 60, {'turn_number': 1})
+    BattleTimerRepository.schedule(end_turn, 0, {'turn_number': 2})
+    BattleTimerRepository.schedule(duration, 60, {'battle_id': 1})
+
+    assert BattleTimerRepository.pop_due(10) == [(end_turn, {'turn_number': 2})]
+    assert BattleTimerRepository.get_kind(end_turn) == BattleTimerKind.END_TURN
+    assert BattleTimerRepository.pop_due(10) == []
+
+    BattleTimerRepository.schedule(end_turn, 0, {'turn_number': 3})
+    BattleTimerRepository.cancel_battle(1)
+    assert BattleTimerRepository.pop_due(10) == []
+
+
+def test_cancel_stale_end_turn():
+    battle = Battle(id=1, turn_number=1, turn=2, first_turn_idx=1)
+    BattleTimerRepository.schedule_end_turn(battle, 60, player_id=1, opponent_id=2)
+    assert not BattleTimerRepository.cancel_stale_end_turn(battle)
+
+    # a stale instance from an earlier turn keeps the timer
+    battle.turn = 1
+    assert not BattleTimerRepository.cancel_stale_end_turn(battle)
+
+    battle.turn_number = 2
+    assert BattleTimerRepository.cancel_stale_end_turn(battle)
+    assert BattleTimerRepository.count_scheduled() == 0
@@ -0,0 +1,62 @@
+# pylint: disable=redefined-outer-name
+import pytest
+from faker import Faker
+
+from app.enums.card import CardElementsEnum
+from app.models.card import Card
+from app.models.deck import CustomDeck, CustomDeckToCard
+from app.models.player import Player
+from app.models.user import User
+
+
+@pytest.fixture()
+def deck(db) -> CustomDeck:  # pylint: disable=unused-argument, invalid-name
+    player = Player.objects.create(user=User.objects.create(username=Faker().user_name()))
+    return CustomDeck.objects.create(name='test', player=player)
+
+
+@pytest.fixture()
+def water_card(db) -> Card:  # pylint: disable=unused-argument, invalid-name
+    return Card.objects.create(custom_id='T1', name='water', element=CardElementsEnum.water)
+
+
+@pytest.fixture()
+def fire_card(db) -> Card:  # pylint: disable=unused-argument, invalid-name
+    return Card.objects.create(custom_id='T2', name='fire', element=CardElementsEnum.fire)
+
+
+def get_summary(deck: CustomDeck) -> tuple:
+    deck.refresh_from_db()
+    return deck.cards_count, deck.disabled_cards_count, deck.element_counts
+
+
+def test_deck_summary(deck, water_card, fire_card):
+    CustomDeckToCard.objects.create(deck=deck, card=water_card)
+    fire_deck_card = CustomDeckToCard.objects.create(deck=deck, card=fire_card)
+    assert get_summary(deck) == (2, 2, {'water': 1, 'fire': 1})
+
+    fire_deck_card.delete()
+    assert get_summary(deck) == (1, 1, {'water': 1})
+
+
+def test_deck_summary_on_m2m_change(deck, water_card, fire_card):
+    deck.cards.add(water_card, fire_card)
+    assert get_summary(deck) == (2, 2, {'water': 1, 'fire': 1})
+
+    deck.cards.remove(fire_card)
+    assert get_summary(deck) == (1, 1, {'water': 1})
+
+    water_card.customdeck_set.clear()
+    assert get_summary(deck) == (0, 0, {})
+
+
+def test_deck_summary_on_card_change(deck, water_card):
+    CustomDeckToCard.objects.create(deck=deck, card=water_card)
+
+    water_card.element = CardElementsEnum.fire
+    water_card.save()
+    assert get_summary(deck) == (1, 1, {'fire': 1})
+
+    CustomDeck.objects.filter(id=deck.id).update(cards_count=0, element_counts={})
+    CustomDeck.objects.filter(id=deck.id).refresh_summaries()
+    assert get_summary(deck) == (1, 1, {'fire': 1})
@@ -0,0 +1,64 @@
+# pylint: disable=redefined-outer-name
+import pytest
+from faker import Faker
+
+from app.models.battle import Battle, BattlePlayer, Enchantment, Tile
+from app.models.player import Player
+from app.models.user import User
+
+
+@pytest.fixture()
+def tile(db) -> Tile:  # pylint: disable=unused-argument, invalid-name
+    player = Player.objects.create(user=User.objects.create(username=Faker().user_name()))
+    battle = Battle.objects.create()
+    battle_player = BattlePlayer.objects.create(
+        battle=battle, player=player, idx=BattlePlayer.PlayerId.ONE
+    )
+    return Tile.objects.create(player=battle_player, order=1, attack=2, hp=3)
+
+
+def add_buff(tile: Tile, attack: int, hp: int) -> Enchantment:
+    return Enchantment.objects.create(
+        tile=tile,
+        affects_attack=True,
+        attack_change_value=attack,
+        affects_hp=True,
+        hp_change_value=hp,
+    )
+
+
+def test_enchantment_totals(tile):
+    buff = add_buff(tile, 2, 1)
+    add_buff(tile, -1, 4)
+    tile.refresh_from_db()
+    assert (tile.enchantment_attack, tile.enchantment_hp) == (1, 5)
+    assert tile.get_attack_with_enchantments == 3
+
+    buff.attack_change_value = 5
+    buff.save()
+    tile.refresh_from_db()
+    assert (tile.enchantment_attack, tile.enchantment_hp) == (4, 5)
+
+    buff.delete()
+    tile.refresh_from_db()
+    assert (tile.enchantment_attack, tile.enchantment_hp) == (-1, 4)
+    assert tile.get_attack_with_enchantments == 1
+
+    # a full save of a stale instance keeps the totals
+    stale_tile = Tile.objects.get(id=tile.id)
+    add_buff(tile, 3, 3)
+    stale_tile.save()
+    tile.refresh_from_db()
+    assert (tile.enchantment_attack, tile.enchantment_hp) == (2, 7)
+
+
+def test_flushed_tile_has_no_enchantment_totals(tile):
+    add_buff(tile, 2, 1)
+    tile = Tile.objects.get(id=tile.id)
+
+    tile.flush()
+
+    assert (tile.enchantment_attack, tile.enchantment_hp) == (0, 0)
+    tile.refresh_from_db()
+    assert (tile.enchantment_attack, tile.enchantment_hp) == (0, 0)
+    assert not tile.enchantments.exists()
@@ -1,11 +1,15 @@
 # pylint: disable=protected-access,redefined-outer-name
+from datetime import timedelta
+
 import pytest
 from django.conf import settings
+from django.utils import timezone
 from faker import Faker
 from mock.mock import call
 
-from app.models.player import Player
+from app.models.player import Player, PlayerActivity
 from app.models.user import User
+from app.redis_client import redis_client as real_redis_client
 from app.repositories.player import PlayerRepository
 from app.schemas.player import PlayerStatusOverWebsocket
 from app.schemas.ws_schemas import PlayerStatus
@@ -14,22 +18,13 @@ from app.schemas.ws_schemas import PlayerStatus
 @pytest.fixture()
 def redis_client(mocker):
     mock = mocker.patch('app.repositories.player.redis_client', ruturn_value=None)
-    mock.zcard.return_value = None
+    mock.pipeline.return_value.execute.return_value = [None, None]
     return mock
 
 
 @pytest.fixture()
-def _redis_client_zcard_side_effect_online(
-    redis_client, player_status_battle_group_name, player_status_lobby_group_name
-):
-    def side_effect(value):
-        if value == player_status_battle_group_name:
-            return None
-        if value == player_status_lobby_group_name:
-            return 1
-        return None
-
-    redis_client.zcard.side_effect = side_effect
+def _redis_client_zcard_side_effect_online(redis_client):
+    redis_client.pipeline.return_value.execute.return_value = [None, 1]
 
 
 @pytest.fixture()
@@ -83,11 +78,17 @@ def player_status_lobby_group_name(player) -> str:
 
 
 def test_player_status_in_battle(
-    redis_client, player_status_in_battle, player_status_battle_group_name, player
+    redis_client,
+    player_status_in_battle,
+    player_status_lobby_group_name,
+    player_status_battle_group_name,
+    player,
 ):
-    redis_client.zcard.return_value = 1
+    redis_client.pipeline.return_value.execute.return_value = [1, None]
     status = PlayerRepository.get_player_status(player)
-    redis_client.zcard.assert_called_once_with(player_status_battle_group_name)
+    redis_client.pipeline.return_value.zcard.assert_has_calls(
+        [call(player_status_battle_group_name), call(player_status_lobby_group_name)]
+    )
     assert status == player_status_in_battle
 
 
@@ -99,7 +100,7 @@ def test_player_status_offline(
     player,
 ):
     status = PlayerRepository.get_player_status(player)
-    redis_client.zcard.assert_has_calls(
+    redis_client.pipeline.return_value.zcard.assert_has_calls(
         [call(player_status_battle_group_name), call(player_status_lobby_group_name)]
     )
     assert status == player_status_offline
@@ -114,7 +115,7 @@ def test_player_status_online(
     player,
 ):
     status = PlayerRepository.get_player_status(player)
-    redis_client.zcard.assert_has_calls(
+    redis_client.pipeline.return_value.zcard.assert_has_calls(
         [call(player_status_battle_group_name), call(player_status_lobby_group_name)]
     )
     assert status == player_status_online
@@ -129,7 +130,49 @@ def test_player_status_away(
     player,
 ):
     status = PlayerRepository.get_player_status(player)
-    redis_client.zcard.assert_has_calls(
+    redis_client.pipeline.return_value.zcard.assert_has_calls(
         [call(player_status_battle_group_name), call(player_status_lobby_group_name)]
     )
     assert status == player_status_away
+
+
+def test_save_last_activity(player):
+    player.user.last_login = timezone.now() - timedelta(hours=1)
+    player.user.save()
+    last_activity = timezone.now()
+
+    PlayerRepository.save_last_activity({player.player_id: last_activity})
+    PlayerRepository.save_last_activity({player.player_id: last_activity})
+
+    player.refresh_from_db()
+    assert player.last_activity == last_activity
+    assert PlayerActivity.objects.filter(player=player).count() == 1
+
+
+def test_player_statuses(player, player_status_online, player_status_lobby_group_name):
+    offline_player = Player.objects.create(user=User.objects.create(username=Faker().user_name()))
+    real_redis_client.zadd(player_status_lobby_group_name, {'channel': 1})
+
+    statuses = PlayerRepository.get_player_statuses([player, offline_player])
+    presence = PlayerRepository.get_presence_many([player, offline_player])
+
+    assert statuses[player.id] == player_status_online
+    assert statuses[offline_player.id].name == PlayerStatusOverWebsocket.OFFLINE.value
+    assert presence == {
+        player.id: PlayerStatusOverWebsocket.ONLINE,
+        offline_player.id: PlayerStatusOverWebsocket.OFFLINE,
+    }
+
+
+def test_find_by_username(player):
+    username = player.user.username
+    assert PlayerRepository.find_by_username(username) == player
+    assert real_redis_client.get(PlayerRepository.get_username_key(username)) == str(player.id)
+    assert PlayerRepository.find_by_username(username) == player
+
+    player.user.username = f'{username}-renamed'
+    player.user.save()
+
+    assert real_redis_client.get(PlayerRepository.get_username_key(username)) is None
+    assert PlayerRepository.find_by_username(username) is None
+    assert PlayerRepository.find_by_username(player.user.username) == player
@@ -0,0 +1,44 @@
+from app.redis_client import redis_client
+from app.repositories.presence import (
+    FriendStatusUpdatesRepository,
+    PresencePlace,
+    PresenceRepository,
+)
+
+
+def test_presence_count():
+    PresenceRepository.add(PresencePlace.LOBBY, 1)
+    PresenceRepository.add(PresencePlace.LOBBY, 2)
+    PresenceRepository.add(PresencePlace.LOBBY, 2)
+    PresenceRepository.add(PresencePlace.BATTLE, 2)
+    assert PresenceRepository.count(PresencePlace.LOBBY) == 2
+    assert PresenceRepository.count(PresencePlace.BATTLE) == 1
+
+    PresenceRepository.remove(PresencePlace.LOBBY, 1, 'lobby-1')
+    assert PresenceRepository.count(PresencePlace.LOBBY) == 1
+
+
+def test_presence_kept_while_user_has_connections():
+    redis_client.zadd('asgi:group:lobby-1', {'channel': 1})
+    PresenceRepository.add(PresencePlace.LOBBY, 1)
+    PresenceRepository.remove(PresencePlace.LOBBY, 1, 'lobby-1')
+    assert PresenceRepository.count(PresencePlace.LOBBY) == 1
+
+
+def test_expired_presence_not_counted():
+    redis_client.zadd(PresenceRepository.get_key(PresencePlace.LOBBY), {1: 0})
+    assert PresenceRepository.count(PresencePlace.LOBBY) == 0
+
+
+def test_friend_status_updates_coalesced():
+    redis_client.zadd('asgi:group:lobby-1', {'channel-1a': 1, 'channel-1b': 1})
+    redis_client.zadd('asgi:group:lobby-2', {'channel-2': 1})
+    assert FriendStatusUpdatesRepository.push([1, 2, 3], 'player-a', 'connected') == [1, 2]
+    assert FriendStatusUpdatesRepository.push([1], 'player-a', 'disconnected') == []
+    assert FriendStatusUpdatesRepository.push([1], 'player-b', 'connected') == []
+
+    # every connection of the user gets the updates
+    assert sorted(FriendStatusUpdatesRepository.pop('channel-1a')) == ['connected', 'disconnected']
+    assert FriendStatusUpdatesRepository.pop('channel-1a') == []
+    assert sorted(FriendStatusUpdatesRepository.pop('channel-1b')) == ['connected', 'disconnected']
+    assert FriendStatusUpdatesRepository.push([1], 'player-a', 'connected') == [1]
@@ -0,0 +1,24 @@
+from django.utils import timezone
+
+from app.models.player import Player
+from app.repositories.statistics import StatisticsRepository, StatisticsTotal
+
+
+def test_total(db):  # pylint: disable=unused-argument, invalid-name
+    StatisticsRepository.incr_total(StatisticsTotal.PLAYERS)
+    assert StatisticsRepository.get_total(StatisticsTotal.PLAYERS, Player.objects) == 0
+
+    StatisticsRepository.incr_total(StatisticsTotal.PLAYERS, 2)
+    assert StatisticsRepository.get_total(StatisticsTotal.PLAYERS, Player.objects) == 2
+
+
+def test_ended_battles_per_day():
+    today = timezone.now().date()
+    StatisticsRepository.add_ended_battle(1, today)
+    StatisticsRepository.add_ended_battle(1, today)
+    StatisticsRepository.add_ended_battle(2, today)
+
+    ended_per_day = StatisticsRepository.get_ended_battles_per_day(7)
+
+    assert ended_per_day[today.isoformat()] == 2
+    assert sum(ended_per_day.values()) == 2
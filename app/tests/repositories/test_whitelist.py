@@ -0,0 +1,17 @@
+from app.models.player import WhitelistWallet
+from app.repositories.whitelist import WhitelistRepository
+
+
+def test_is_whitelisted(db):  # pylint: disable=unused-argument, invalid-name
+    assert not WhitelistRepository.is_whitelisted('0xABC')
+
+    wallet = WhitelistWallet.objects.create(wallet='0xAbC')
+
+    assert WhitelistRepository.is_whitelisted('0xABC')
+    assert WhitelistRepository.is_whitelisted('0xabc')
+    assert not WhitelistRepository.is_whitelisted('0xdef')
+    assert not WhitelistRepository.is_whitelisted(None)
+
+    wallet.delete()
+
+    assert not WhitelistRepository.is_whitelisted('0xabc')
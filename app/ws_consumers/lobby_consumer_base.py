@@ -1,10 +1,13 @@
 # pylint: disable=broad-except, too-many-public-methods
+import asyncio
+import functools
 import logging
 from abc import ABC, abstractmethod
-from typing import Any, Callable, List, Optional
+from typing import Any, Awaitable, Callable, List, Optional, Union
 
-from asgiref.sync import async_to_sync
-from channels.generic.websocket import JsonWebsocketConsumer
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from django.conf import settings
 from pydantic import ValidationError
 
@@ -16,17 +19,56 @@ from app.exceptions import (
 )
 from app.models.player import Player
 from app.models.user import User
+from app.repositories.player import PlayerRepository
+from app.repositories.presence import PresencePlace, PresenceRepository
 from app.schemas import channel_schemas, ws_schemas
 from app.schemas.ws_lobby_event_schemas import ChannelEventType, EventRequestType, EventResponseType
 
 logger = logging.getLogger('django.channels.server')
 logger.setLevel(logging.DEBUG)
 
+SyncHandlerResult = Union[
+    None,
+    ws_schemas.EventResponseMessageBase,
+    List[channel_schemas.ChannelEventMessageProducing],
+]
+
+
+def sync_handler(method: Callable[..., SyncHandlerResult]) -> Callable[..., Awaitable[None]]:
+    """
+    Run a blocking handler in one ``database_sync_to_async`` call.
+
+    The handler returns the message for the client or the channel events to produce, they are
+    sent from the event loop.
+    """
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        result = await database_sync_to_async(method)(self, *args, **kwargs)
+        if isinstance(result, ws_schemas.EventResponseMessageBase):
+            await self.send_json(result)
+        elif result:
+            await self._produce_events(result)
+
+    return wrapper
+
+
+class LobbyConsumerBase(AsyncJsonWebsocketConsumer, ABC):
+    """
+    Async lobby consumer.
+
+    Handlers run on the event loop and do their database and redis work in one
+    ``database_sync_to_async`` call, channel events are sent concurrently.
+    """
 
-class LobbyConsumerBase(JsonWebsocketConsumer, ABC):
     WS_HANDLERS_MAPPING = {}
     CHANNEL_HANDLERS_MAPPING = {}
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._player: Optional[Player] = None
+        self._presence_task: Optional[asyncio.Task] = None
+
     @classmethod
     def update_handlers_mapping(cls, ws_handlers_mapping: dict, channel_handlers_mapping: dict):
         ws_handlers_mapping.update(cls._map_ws_handlers())
@@ -54,60 +96,90 @@ class LobbyConsumerBase(JsonWebsocketConsumer, ABC):
 
     @property
     def player(self) -> Player:
-        return Player.objects.get(user=self.scope.get('user'))
+        """Player of the connection, loaded once on connect"""
+        return self._player
 
-    def connect(self):
+    def _load_player(self) -> Player:
+        return Player.objects.select_related('user', 'status').get(user=self.user)
+
+    def refresh_player(self, fields: List[str]) -> None:
+        """Reload fields changed outside of this connection"""
+        self._player.refresh_from_db(fields=fields)
+
+    @staticmethod
+    def get_group_name(user_id: int) -> str:
+        return f'{settings.LOBBY_CONSUMER_REDIS_GROUP_PREFIX}-{user_id}'
+
+    async def connect(self):
         if self.user is None:
-            return self.close()
-        self.accept()
-        self.on_user_connect()
+            return await self.close()
+        self._player = await database_sync_to_async(self._load_player)()
+        await self.accept()
+        await self.on_user_connect()
         return None
 
-    def on_user_connect(self):
-        async_to_sync(self.channel_layer.group_add)(
-            f'{settings.LOBBY_CONSUMER_REDIS_GROUP_PREFIX}-{self.player.user_id}', self.channel_name
-        )
+    async def on_user_connect(self):
+        await self.channel_layer.group_add(self.get_group_name(self.user.id), self.channel_name)
+        await sync_to_async(PresenceRepository.add)(PresencePlace.LOBBY, self.user.id)
+        self._presence_task = asyncio.create_task(self._keep_presence())
+
+    async def _keep_presence(self):
+        """Refresh the presence of an idle connection before it expires"""
+        while True:
+            await asyncio.sleep(settings.PRESENCE_HEARTBEAT_INTERVAL)
+            try:
+                await sync_to_async(PresenceRepository.add)(PresencePlace.LOBBY, self.user.id)
+            except Exception:
+                logger.exception('Presence heartbeat failed for user %s', self.user.id)
 
-    def disconnect(self, code):
+    async def disconnect(self, code):
         if self.user:
-            self.on_user_disconnect()
+            await self.on_user_disconnect()
 
-    def on_user_disconnect(self):
-        async_to_sync(self.channel_layer.group_discard)(
-            f'{settings.LOBBY_CONSUMER_REDIS_GROUP_PREFIX}-{self.player.user_id}', self.channel_name
+    async def on_user_disconnect(self):
+        if self._presence_task:
+            self._presence_task.cancel()
+            try:
+                await self._presence_task
+            except asyncio.CancelledError:
+                pass
+        group_name = self.get_group_name(self.user.id)
+        await self.channel_layer.group_discard(group_name, self.channel_name)
+        await sync_to_async(PresenceRepository.remove)(
+            PresencePlace.LOBBY, self.user.id, group_name
         )
 
-    def _produce_events(
+    async def _produce_events(
         self,
         events_to_produce: List[channel_schemas.ChannelEventMessageProducing],
     ):
-        for event in events_to_produce:
-            self._produce_event(event)
+        await asyncio.gather(*(self._produce_event(event) for event in events_to_produce))
 
-    def _produce_event(
+    async def _produce_event(
         self,
         event: channel_schemas.ChannelEventMessageProducing,
     ):
         """Send the payload data to the type function which is in the channel lobby."""
         user_id = event.receiver.id if isinstance(event.receiver, User) else event.receiver.user_id
-        async_to_sync(self.channel_layer.group_send)(
-            f'{settings.LOBBY_CONSUMER_REDIS_GROUP_PREFIX}-{user_id}',
-            event.event.dict(),
-        )
+        await self.channel_layer.group_send(self.get_group_name(user_id), event.event.dict())
 
     @classmethod
-    def encode_json(cls, content: ws_schemas.EventResponseMessageBase):
+    async def encode_json(cls, content: ws_schemas.EventResponseMessageBase):
         return content.json()
 
     @staticmethod
     def find_player(
         username: str,
     ) -> Optional[Player]:
-        return Player.objects.filter(user__username=username).first()
+        return PlayerRepository.find_by_username(username)
 
-    def receive(self, *args, **kwargs):  # pylint: disable=unused-argument, too-many-statements
+    async def receive(
+        self, *args, **kwargs
+    ):  # pylint: disable=unused-argument, too-many-statements
         """Accepts all events."""
         logger.info('WS received data: %s', kwargs['text_data'])
+        if self.user:
+            await sync_to_async(PresenceRepository.add)(PresencePlace.LOBBY, self.user.id)
         try:
             ws_event = ws_schemas.EventResponseMessage.parse_raw(kwargs['text_data']).__root__
         except ValidationError as e:
@@ -121,7 +193,7 @@ class LobbyConsumerBase(JsonWebsocketConsumer, ABC):
                     }
                 )
 
-            self.send_json(
+            await self.send_json(
                 ws_schemas.EventResponseErrorMessage(
                     event=EventResponseType.ERROR,
                     params={
@@ -135,7 +207,7 @@ class LobbyConsumerBase(JsonWebsocketConsumer, ABC):
         try:
             handler = self._get_ws_handler(ws_event.event)
         except WSHandlerUnknownEventException as e:
-            self.send_json(
+            await self.send_json(
                 ws_schemas.EventResponseErrorMessage(
                     event=EventResponseType.ERROR,
                     params={
@@ -147,7 +219,7 @@ class LobbyConsumerBase(JsonWebsocketConsumer, ABC):
             return None
 
         try:
-            return handler(self, ws_event)
+            return await handler(self, ws_event)
         except WSHandlerInvalidStatusException as e:
             error_message = str(e.message)
             error_data = e.data
@@ -159,7 +231,7 @@ class LobbyConsumerBase(JsonWebsocketConsumer, ABC):
             error_message = f'{type(e).__name__}: {str(e)}'
             error_data = {}
 
-        self.send_json(
+        await self.send_json(
             ws_schemas.EventResponseErrorMessage(
                 event=EventResponseType.ERROR,
                 params={
@@ -170,21 +242,21 @@ class LobbyConsumerBase(JsonWebsocketConsumer, ABC):
         )
         return None
 
-    def channel_handler(self, data: dict):
+    async def channel_handler(self, data: dict):
         """Accepts all events."""
         logger.info('Channel received data: %s', data)
         channel_event = channel_schemas.ChannelEventMessage.parse_obj(data).__root__
         channel_event.channel_type_event = ChannelEventType(channel_event.channel_type_event)
         handler = self._get_channel_handler(channel_event.channel_type_event)
-        handler(self, channel_event)
+        await handler(self, channel_event)
 
-    def _get_ws_handler(self, type_event: EventRequestType) -> Callable[[Any], Any]:
+    def _get_ws_handler(self, type_event: EventRequestType) -> Callable[[Any], Awaitable]:
         handler = self.WS_HANDLERS_MAPPING.get(type_event)
         if not handler:
             raise WSHandlerUnknownEventException(event=type_event.value)
         return handler
 
-    def _get_channel_handler(self, type_event: ChannelEventType) -> Callable[[Any], Any]:
+    def _get_channel_handler(self, type_event: ChannelEventType) -> Callable[[Any], Awaitable]:
         handler = self.CHANNEL_HANDLERS_MAPPING.get(type_event)
         if not handler:
             raise ValueError(f'No channel handler for {type_event}')
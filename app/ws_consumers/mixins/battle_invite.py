@@ -15,7 +15,7 @@ from app.schemas.ws_lobby_event_schemas import (
     EventRequestBattleInviteType,
     EventResponseType,
 )
-from app.ws_consumers.lobby_consumer_base import LobbyConsumerBase
+from app.ws_consumers.lobby_consumer_base import LobbyConsumerBase, sync_handler
 
 
 class BattleInviteMixin(LobbyConsumerBase):
@@ -35,6 +35,7 @@ class BattleInviteMixin(LobbyConsumerBase):
             ChannelEventType.HANDLE_BATTLE_INVITE_ACCEPT: cls.handle_channel_battle_invite_accept,
         }
 
+    @sync_handler
     def handle_ws_battle_invite_create(self, event: ws_schemas.EventRequestBattleInviteMessage):
         """
         Create a battle invite
@@ -51,6 +52,10 @@ class BattleInviteMixin(LobbyConsumerBase):
             raise WSHandlerRecipientNotFoundException()
 
         player = self.player
+        # avatars are bought and wallets linked outside of the lobby, the player cached on
+        # connect may be behind
+        self.refresh_player(['num_avatars_owned'])
+        player.user.refresh_from_db(fields=['metamask_token'])
         player_custom_deck = DeckRepository.get_player_selected_deck(player)
         invited_player_custom_deck = DeckRepository.get_player_selected_deck(invited_player)
         if not (player.is_whitelist_user or player.num_avatars_owned) or not (
@@ -80,9 +85,9 @@ class BattleInviteMixin(LobbyConsumerBase):
             to_username=player.username,
             event_send_type=EventResponseType.BATTLE_INVITE_RECEIVE,
         )
-        self._produce_event(event)
-        return None
+        return [event]
 
+    @sync_handler
     def handle_ws_battle_invite_decline(self, event: ws_schemas.EventRequestBattleInviteMessage):
         """
         Decline a battle invite
@@ -105,8 +110,9 @@ class BattleInviteMixin(LobbyConsumerBase):
             to_username=player.username,
             event_send_type=EventResponseType.BATTLE_INVITE_DECLINE,
         )
-        self._produce_event(event)
+        return [event]
 
+    @sync_handler
     def handle_ws_battle_invite_cancel(
         self,
         event: ws_schemas.EventRequestBattleInviteMessage,
@@ -132,8 +138,9 @@ class BattleInviteMixin(LobbyConsumerBase):
             to_username=player.username,
             event_send_type=EventResponseType.BATTLE_INVITE_CANCEL,
         )
-        self._produce_event(event)
+        return [event]
 
+    @sync_handler
     def handle_ws_battle_invite_accept(
         self,
         event: ws_schemas.EventRequestBattleInviteMessage,
@@ -153,7 +160,7 @@ class BattleInviteMixin(LobbyConsumerBase):
             raise WSHandlerRecipientNotFoundException()
 
         player = self.player
-        self._battle_invite_accept(sender_player=sender_player, invited_player=player)
+        return self._battle_invite_accept(sender_player=sender_player, invited_player=player)
 
     def _battle_invite_accept(self, sender_player: Player, invited_player: Player):
         battle = BattleInviteRepository.accept(
@@ -168,18 +175,20 @@ class BattleInviteMixin(LobbyConsumerBase):
                 sender_player, battle.room_id, battle.player_1_ticket
             ),
         ]
-        self._produce_events(events_to_produce)
+        return events_to_produce
 
-    def handle_channel_battle_invite_show(self, event: channel_schemas.ChannelEventBattleMessage):
+    async def handle_channel_battle_invite_show(
+        self, event: channel_schemas.ChannelEventBattleMessage
+    ):
         ws_event = ws_schemas.EventResponseBattleInviteMessage(
             event=event.event,
             params=ws_schemas.EventBattleInviteMessagePayload(
                 to_username=event.payload.to_username
             ),
         )
-        self.send_json(ws_event)
+        await self.send_json(ws_event)
 
-    def handle_channel_battle_invite_accept(
+    async def handle_channel_battle_invite_accept(
         self, event: channel_schemas.ChannelEventBattleAcceptMessage
     ):
         ws_event = ws_schemas.EventResponseBattleInviteAcceptMessage(
@@ -188,7 +197,7 @@ class BattleInviteMixin(LobbyConsumerBase):
                 room_id=event.payload.room_id, ticket=event.payload.ticket
             ),
         )
-        self.send_json(ws_event)
+        await self.send_json(ws_event)
 
     @staticmethod
     def _create_channel_event_battle_invite_show(
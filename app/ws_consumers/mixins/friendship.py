@@ -1,8 +1,11 @@
 # pylint: disable=line-too-long,too-many-public-methods,too-many-lines,broad-except
+from channels.db import database_sync_to_async
+
 from app.exceptions import WSHandlerInvalidStatusException, WSHandlerRecipientNotFoundException
 from app.models.player import Friendship, Player, PlayerStatus
 from app.repositories.friendship import FriendshipRepository
 from app.repositories.player import PlayerRepository
+from app.repositories.presence import FriendStatusUpdatesRepository
 from app.schemas import channel_schemas, ws_schemas
 from app.schemas.ws_lobby_event_schemas import (
     ChannelEventType,
@@ -10,7 +13,7 @@ from app.schemas.ws_lobby_event_schemas import (
     EventRequestPlayerStatusType,
     EventResponseType,
 )
-from app.ws_consumers.lobby_consumer_base import LobbyConsumerBase
+from app.ws_consumers.lobby_consumer_base import LobbyConsumerBase, sync_handler
 
 
 class FriendshipMixin(LobbyConsumerBase):
@@ -30,55 +33,66 @@ class FriendshipMixin(LobbyConsumerBase):
         return {
             ChannelEventType.HANDLE_UPDATE_FRIENDSHIP_LIST: cls.handle_channel_update_friendship_list,
             ChannelEventType.HANDLE_CHANNEL_USER_STATUS: cls.handle_channel_user_status,
+            ChannelEventType.HANDLE_FRIENDS_STATUS_UPDATES: cls.handle_channel_friends_status_updates,
             ChannelEventType.HANDLE_FRIENDSHIP_REQUEST_RECEIVE: cls.handle_channel_friendship_request_receive,
+            ChannelEventType.HANDLE_PLAYER_REFRESH: cls.handle_channel_player_refresh,
         }
 
-    def on_user_connect(self):
-        super().on_user_connect()
-        self._send_friend_list()
+    async def on_user_connect(self):
+        await super().on_user_connect()
+        friend_list, events_to_produce = await database_sync_to_async(self._connect)()
+        await self.send_json(friend_list)
+        await self._produce_events(events_to_produce)
+
+    def _connect(self):
+        # the full list already has the changes waiting for this user
+        FriendStatusUpdatesRepository.pop(self.channel_name)
         player = self.player
+        friend_list = self._get_friend_list_message(player)
         player.status = None
-        player.save()
-        events_to_produce = []
-        self._update_friends_friendship_list(
-            EventResponseType.FRIEND_CONNECTED, self.player, events_to_produce
-        )
-        self._produce_events(events_to_produce)
-
-    def on_user_disconnect(self):
-        super().on_user_disconnect()
-        events_to_produce = []
-        self._update_friends_friendship_list(
-            EventResponseType.FRIEND_DISCONNECTED, self.player, events_to_produce
+        player.save(update_fields=['status'])
+        events_to_produce = [
+            self._create_channel_event_player_refresh(['status']),
+            *self._get_status_events(EventResponseType.FRIEND_CONNECTED, player),
+        ]
+        return friend_list, events_to_produce
+
+    async def on_user_disconnect(self):
+        await super().on_user_disconnect()
+        events_to_produce = await database_sync_to_async(
+            lambda: self._get_status_events(EventResponseType.FRIEND_DISCONNECTED, self.player)
+        )()
+        await self._produce_events(events_to_produce)
+
+    def _get_friend_list_message(
+        self, player: Player, type_event: EventResponseType = EventResponseType.FRIEND_LIST
+    ) -> ws_schemas.EventResponseFriendshipListMessage:
+        return ws_schemas.EventResponseFriendshipListMessage(
+            event=type_event,
+            params=self._build_friend_list(player),
         )
-        self._produce_events(events_to_produce)
 
-    def _send_friend_list(self, type_event: EventResponseType = EventResponseType.FRIEND_LIST):
-        player = self.player
-        friendships = FriendshipRepository.get_friendship_list(player=player)
-        friend_list = []
-        for friendship in friendships:
-            friendship_player = self._get_other_player(friendship, player)
-            friendship_status = FriendshipRepository.get_status_relative_player(friendship, player)
-            friendship_model = ws_schemas.EventResponseFriendshipParams(
-                status=friendship_status,
+    def _build_friend_list(self, player: Player) -> list[ws_schemas.EventResponseFriendshipParams]:
+        friendships = list(FriendshipRepository.get_friendship_list(player=player))
+        friends = [self._get_other_player(friendship, player) for friendship in friendships]
+        statuses = PlayerRepository.get_player_statuses(friends)
+        return [
+            ws_schemas.EventResponseFriendshipParams(
+                status=FriendshipRepository.get_status_relative_player(friendship, player),
                 friend=ws_schemas.EventResponseFriendshipParamsPlayer(
-                    player_id=friendship_player.player_id,
-                    status=PlayerRepository.get_player_status(friendship_player),
-                    username=friendship_player.username,
+                    player_id=friend.player_id,
+                    status=statuses[friend.id],
+                    username=friend.username,
                 ),
             )
-            friend_list.append(friendship_model)
-        event = ws_schemas.EventResponseFriendshipListMessage(
-            event=type_event,
-            params=friend_list,
-        )
-        self.send_json(event)
+            for friendship, friend in zip(friendships, friends)
+        ]
 
     @staticmethod
     def _get_other_player(friendship: Friendship, player: Player) -> Player:
         return friendship.player if friendship.friend_id == player.id else friendship.friend
 
+    @sync_handler
     def handle_ws_friendship_request_create(self, event: ws_schemas.EventRequestFriendshipMessage):
         """
         Create a friendship request
@@ -103,8 +117,9 @@ class FriendshipMixin(LobbyConsumerBase):
             ),
             self._create_channel_event_friendship_request_receive(invited_player, friendship.pk),
         ]
-        self._produce_events(events_to_produce)
+        return events_to_produce
 
+    @sync_handler
     def handle_ws_friendship_request_accept(self, event: ws_schemas.EventRequestFriendshipMessage):
         """
         Accept a friendship request
@@ -129,8 +144,9 @@ class FriendshipMixin(LobbyConsumerBase):
                 sender_player, EventResponseType.FRIENDS_REQUEST_ACCEPT
             ),
         ]
-        self._produce_events(events_to_produce)
+        return events_to_produce
 
+    @sync_handler
     def handle_ws_friendship_remove(self, event: ws_schemas.EventRequestFriendshipMessage):
         """Remove a friendship request.
 
@@ -158,8 +174,9 @@ class FriendshipMixin(LobbyConsumerBase):
                 other_player, EventResponseType.FRIENDS_REQUEST_REMOVE
             ),
         ]
-        self._produce_events(events_to_produce)
+        return events_to_produce
 
+    @sync_handler
     def handle_ws_friendship_request_cancel(self, event: ws_schemas.EventRequestFriendshipMessage):
         """
         Cancel a friendship request
@@ -187,8 +204,9 @@ class FriendshipMixin(LobbyConsumerBase):
                 invited_player, EventResponseType.FRIEND_LIST
             ),
         ]
-        self._produce_events(events_to_produce)
+        return events_to_produce
 
+    @sync_handler
     def handle_ws_friendship_request_decline(
         self,
         event: ws_schemas.EventRequestFriendshipMessage,
@@ -221,8 +239,9 @@ class FriendshipMixin(LobbyConsumerBase):
             ),
         ]
 
-        self._produce_events(events_to_produce)
+        return events_to_produce
 
+    @sync_handler
     def handle_ws_change_player_status(self, event: ws_schemas.EventRequestPlayerStatusMessage):
         player = self.player
         status = None
@@ -232,27 +251,43 @@ class FriendshipMixin(LobbyConsumerBase):
                 raise WSHandlerInvalidStatusException(status=event.params.status_name)
 
         if not PlayerRepository.is_status_changeable(player, status):
-            return
+            return None
 
         player.status = status
-        player.save()
+        player.save(update_fields=['status'])
 
-        events_to_produce = []
-        self._update_friends_friendship_list(
-            EventResponseType.FRIEND_UPDATED, player, events_to_produce
-        )
-        self._produce_events(events_to_produce)
+        return [
+            self._create_channel_event_player_refresh(['status']),
+            *self._get_status_events(EventResponseType.FRIEND_UPDATED, player),
+        ]
 
+    @sync_handler
     def handle_channel_update_friendship_list(self, event: channel_schemas.ChannelTypeEventMessage):
-        self._send_friend_list(event.payload.event_send_type)
+        return self._get_friend_list_message(
+            self.player, EventResponseType(event.payload.event_send_type)
+        )
 
+    @sync_handler
     def handle_channel_user_status(self, event: channel_schemas.ChannelTypeEventMessage):
-        events_to_produce = []
-        self._update_friends_friendship_list(
-            event.payload.event_send_type, self.player, events_to_produce
+        return self._get_status_events(
+            EventResponseType(event.payload.event_send_type), self.player
+        )
+
+    @sync_handler
+    def handle_channel_friends_status_updates(
+        self, event: channel_schemas.ChannelTypeEventMessage
+    ):  # pylint: disable=unused-argument
+        updates = FriendStatusUpdatesRepository.pop(self.channel_name)
+        if not updates:
+            return None
+        return ws_schemas.EventResponseFriendsStatusMessage(
+            event=EventResponseType.FRIENDS_STATUS_UPDATED,
+            params=[
+                ws_schemas.EventResponseFriendStatusParams.parse_raw(update) for update in updates
+            ],
         )
-        self._produce_events(events_to_produce)
 
+    @sync_handler
     def handle_channel_friendship_request_receive(
         self, event: channel_schemas.ChannelFriendshipIDMessage
     ):
@@ -261,7 +296,26 @@ class FriendshipMixin(LobbyConsumerBase):
         ws_message = self._create_ws_message_friendship_request_receive(
             friendship, self.player, requested_player
         )
-        self.send_json(ws_message)
+        return ws_message
+
+    @sync_handler
+    def handle_channel_player_refresh(self, event: channel_schemas.ChannelPlayerRefreshMessage):
+        if event.payload.sender_channel_name != self.channel_name:
+            self.refresh_player(event.payload.fields)
+
+    def _create_channel_event_player_refresh(
+        self, fields: list[str]
+    ) -> channel_schemas.ChannelEventMessageProducing:
+        """Reload the changed fields in the other connections of the user"""
+        return channel_schemas.ChannelEventMessageProducing(
+            receiver=self.user,
+            event=channel_schemas.ChannelPlayerRefreshMessage(
+                channel_type_event=ChannelEventType.HANDLE_PLAYER_REFRESH,
+                payload=channel_schemas.ChannelPlayerRefreshMessagePayload(
+                    fields=fields, sender_channel_name=self.channel_name
+                ),
+            ),
+        )
 
     @staticmethod
     def _create_channel_event_update_friendship_list(
@@ -310,22 +364,40 @@ class FriendshipMixin(LobbyConsumerBase):
             ],
         )
 
-    def _update_friends_friendship_list(
-        self,
-        type_event: EventResponseType,
-        player: Player,
-        events_to_produce: list,
-    ):
+    def _get_status_events(
+        self, type_event: EventResponseType, player: Player
+    ) -> list[channel_schemas.ChannelEventMessageProducing]:
+        """
+        Channel events sending the player status change to accepted friends.
+
+        Friends apply it to their list without reloading it, changes that reach a friend before
+        it has read the previous ones are merged into one message.
+        """
         friendships = FriendshipRepository.get_friendship_list(player=player, is_accepted=True)
-        event = channel_schemas.ChannelTypeEventMessage(
-            channel_type_event=ChannelEventType.HANDLE_UPDATE_FRIENDSHIP_LIST,
-            payload=channel_schemas.ChannelTypeEventMessagePayload(event_send_type=type_event),
+        friends = [self._get_other_player(friendship, player) for friendship in friendships]
+        if not friends:
+            return []
+        update = ws_schemas.EventResponseFriendStatusParams(
+            event=type_event,
+            friend=ws_schemas.EventResponseFriendshipParamsPlayer(
+                player_id=player.player_id,
+                status=PlayerRepository.get_player_status(player),
+                username=player.username,
+            ),
         )
-        for friendship in friendships:
-            friendship_player = self._get_other_player(friendship, player)
-            events_to_produce.append(
-                channel_schemas.ChannelEventMessageProducing(
-                    receiver=friendship_player,
-                    event=event,
-                )
+        user_ids_to_notify = set(
+            FriendStatusUpdatesRepository.push(
+                [friend.user_id for friend in friends], player.player_id, update.json()
             )
+        )
+        event = channel_schemas.ChannelTypeEventMessage(
+            channel_type_event=ChannelEventType.HANDLE_FRIENDS_STATUS_UPDATES,
+            payload=channel_schemas.ChannelTypeEventMessagePayload(
+                event_send_type=EventResponseType.FRIENDS_STATUS_UPDATED
+            ),
+        )
+        return [
+            channel_schemas.ChannelEventMessageProducing(receiver=friend, event=event)
+            for friend in friends
+            if friend.user_id in user_ids_to_notify
+        ]
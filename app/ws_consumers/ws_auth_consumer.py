@@ -10,17 +10,20 @@ from typing import Union
 from asgiref.sync import async_to_sync, sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from django.conf import settings
+from django.db import transaction
 
-from app.battle_service import get_card_behavior
-from app.enums.card import CardTypesEnum
-from app.models.battle import Battle, BattlePlayer, CardActiveMystery, Tile
+from app.exceptions import BattleStateConflict
+from app.models.battle import Battle, BattlePlayer
 from app.models.player import Player
 from app.models.user import User
 from app.redis_client import redis_client
+from app.repositories.battle import BattleRepository
+from app.repositories.presence import PresencePlace, PresenceRepository
 from app.schemas import channel_schemas
-from app.serializers.battle import TileSerializer
-from app.tasks import save_battle_log_to_mongo
-from app.utils.battle_consumer_utils import BattleServerEventsEnum, ServerEventData, get_state
+from app.services.battle_board import BattleBoard
+from app.services.battle_log import battle_log_buffer
+from app.services.trigger_dispatcher import TriggerDispatcher
+from app.utils.battle_consumer_utils import BattleServerEventsEnum, ServerEventData
 from app.utils.websocket import safe
 
 logger = logging.getLogger()
@@ -84,86 +87,30 @@ class AuthConsumer(AsyncJsonWebsocketConsumer):
         self.opponent_player = None
         self.ping_task = None
         self.ping_uuid = None
+        self._board = None
+        self.trigger_dispatcher = TriggerDispatcher(self)
         super(AuthConsumer, self).__init__(*args, **kwargs)
 
+    @property
+    def board(self) -> BattleBoard:
+        """
+        In-memory board of the battle, shared by triggers and card abilities during one action
+        """
+        if self._board is None:
+            self._board = BattleBoard(self.battle)
+        return self._board
+
+    def reset_board(self):
+        """Forget the board when the action is over, the next action loads a fresh one"""
+        if self._board is not None:
+            self._board.close()
+        self._board = None
+
     def check_triggers(self, event: ServerEventData):
         if not self.get_opponent_player:
             # to avoid checking triggers on cancel battle
             return
-        state = get_state(self.battle, self.player_id, self)
-        # check friendly avatar damage
-        if (
-            event.event == 'avatar_damage'
-            and event.params['target_avatar'] == 'player'
-            and event.to_opponent_only
-        ):
-            active_mysteries = CardActiveMystery.objects.filter(player=state.enemy)
-            for active_mystery in active_mysteries:
-                behavior = get_card_behavior(active_mystery)
-                behavior.on_player_avatar_damage(
-                    state, active_mystery, state.player, damage=event.params['damage']
-                )
-        if (
-            event.event == 'move_card_from_hand_to_tile'
-            and state.player.tile.exclude_mia().filter(id=event.params['tile_id']).exists()
-        ):
-            active_mysteries = CardActiveMystery.objects.filter(player=state.enemy)
-            tile_with_card = Tile.objects.get(id=event.params['tile_id'])
-            for active_mystery in active_mysteries:
-
-                behavior = get_card_behavior(active_mystery)
-                behavior.on_opponent_creature_play(state, active_mystery, tile_with_card)
-            tile_serializer_data = TileSerializer(tile_with_card).data
-            description = (
-                tile_serializer_data['card']['description']
-                if tile_serializer_data['card'] and tile_serializer_data['card']['description']
-                else ''
-            )
-            if (description and 'warcry</b>:' in description.lower()) or (
-                tile_with_card.original_card
-                and tile_with_card.original_card.description
-                and 'warcry:' in tile_with_card.original_card.description.lower()
-            ):
-                for tile in (
-                    state.player.tile.exclude_mia()
-                    .exclude_censor()
-                    .non_free()
-                    .exclude(id=tile_with_card.id)
-                ):
-                    behavior = get_card_behavior(tile)
-                    behavior.on_play_friendly_creature_with_warcry(state, tile)
-
-        if event.event == 'mia_enchantment_removed':
-            tile = Tile.objects.get(id=event.params['tile_id'])
-            behavior = get_card_behavior(tile)
-            behavior.on_awake_from_mia(state, tile)
-
-        if event.event == BattleServerEventsEnum.tile_card_death:
-            tile_battle_player = Tile.objects.get(id=event.params['tile_id']).player
-            active_mysteries = CardActiveMystery.objects.filter(player=tile_battle_player)
-            for active_mystery in active_mysteries:
-                tile = Tile.objects.get(id=event.params['tile_id'])
-                behavior = get_card_behavior(active_mystery)
-                if tile.card.type == CardTypesEnum.serf:
-                    behavior.on_friendly_creature_death(state, active_mystery, tile.card)
-            tiles = (
-                tile_battle_player.tile.exclude_mia()
-                .exclude_censor()
-                .non_free()
-                .exclude(id=event.params['tile_id'])
-            )
-            for tile in tiles:
-                behavior = get_card_behavior(tile)
-                behavior.on_friendly_creature_death(state, tile)
-        if (
-            event.event == BattleServerEventsEnum.spell_card_played
-            and not event.to_opponent_only
-            and state.player.hand.filter(id=event.params['card_hand']['id']).exists()
-        ):
-            tiles = state.player.tile.exclude_mia().exclude_censor().non_free()
-            for tile in tiles:
-                behavior = get_card_behavior(tile)
-                behavior.on_any_spell_card_played(state, event.params['card_hand']['id'], tile)
+        self.trigger_dispatcher.dispatch(event)
 
     def store_event(self, event, check_triggers=True):
         if not event:
@@ -209,7 +156,7 @@ class AuthConsumer(AsyncJsonWebsocketConsumer):
             self.send_message_to_opponent(event.event, event_params)
 
     def fire_events(self):
-        pass
+        self.reset_board()
 
         events = self.events
         events = sorted(events, key=lambda e: e.timestamp)
@@ -299,6 +246,7 @@ class AuthConsumer(AsyncJsonWebsocketConsumer):
             self.channel_name,
         )
         await self.accept()
+        await sync_to_async(PresenceRepository.add)(PresencePlace.BATTLE, self.user_id)
         if not settings.DISABLE_PING:
             self.create_ping_task()
 
@@ -309,9 +257,10 @@ class AuthConsumer(AsyncJsonWebsocketConsumer):
     async def disconnect(self, close_code=None, from_ping_task: bool = False):
         logger.info(f'disconnect called on user {self.user_id} for battle {self.battle.id}')
         await self.channel_layer.group_discard(self.room_group_id, self.channel_name)
-        await self.channel_layer.group_discard(
-            f'{settings.BATTLE_CONSUMER_REDIS_GROUP_PREFIX}-{self.user_id}-events',
-            self.channel_name,
+        events_group_name = f'{settings.BATTLE_CONSUMER_REDIS_GROUP_PREFIX}-{self.user_id}-events'
+        await self.channel_layer.group_discard(events_group_name, self.channel_name)
+        await sync_to_async(PresenceRepository.remove)(
+            PresencePlace.BATTLE, self.user_id, events_group_name
         )
         if not from_ping_task and not settings.DISABLE_PING:
             self.ping_task.cancel()
@@ -319,6 +268,7 @@ class AuthConsumer(AsyncJsonWebsocketConsumer):
                 await self.ping_task
             except asyncio.CancelledError:
                 pass
+        await battle_log_buffer.flush()
 
     @property
     def get_opponent_channel_name(self):
@@ -347,6 +297,7 @@ class AuthConsumer(AsyncJsonWebsocketConsumer):
 
     @sync_to_async
     def set_last_player_activity(self):
+        PresenceRepository.add(PresencePlace.BATTLE, self.user_id)
         player = self.battle_player.player
         if player:
             player.update_last_activity()
@@ -363,13 +314,8 @@ class AuthConsumer(AsyncJsonWebsocketConsumer):
 
     async def send_json(self, content, close=False):
         # save server event
-        save_battle_log_to_mongo.apply_async(
-            args=(
-                str(self.battle.id),
-                str(self.battle_player.id),
-                'server_event',
-                content,
-            ),
+        await battle_log_buffer.add(
+            self.battle.id, self.battle_player.id, 'server_event', copy.deepcopy(content)
         )
         await super().send_json(content, close)
 
@@ -391,13 +337,8 @@ class AuthConsumer(AsyncJsonWebsocketConsumer):
             self.create_ping_task()
             return
 
-        save_battle_log_to_mongo.apply_async(
-            args=(
-                str(self.battle.id),
-                str(self.battle_player.id),
-                'client_event',
-                content,
-            ),
+        await battle_log_buffer.add(
+            self.battle.id, self.battle_player.id, 'client_event', copy.deepcopy(content)
         )
         event = content['event']
         params = content['params'] if 'params' in content.keys() else {}
@@ -407,10 +348,35 @@ class AuthConsumer(AsyncJsonWebsocketConsumer):
             if asyncio.iscoroutinefunction(handler):
                 await handler(**params)
             else:
-                await sync_to_async(handler)(**params)
+                await sync_to_async(self.run_action)(handler, **params)
+            self.reset_board()
         else:
             raise ValueError('No handler for event %s' % event)
 
+    def run_action(self, handler, **params):
+        """
+        Run a client event handler reading and writing the redis battle state once.
+
+        The database changes of the action are rolled back when the state was changed by
+        another action in the meantime, and the client is told to try again.
+        """
+        try:
+            with transaction.atomic(), BattleRepository.unit_of_work(self.battle):
+                handler(**params)
+        except BattleStateConflict as exc:
+            logger.warning('Battle %s action %s conflicted', self.battle.id, handler.__name__)
+            # events of the rolled back action must not reach the clients
+            self.flush_events()
+            self.store_event(
+                ServerEventData(
+                    BattleServerEventsEnum.server_error,
+                    params={'error_name': 'Battle State Conflict', 'error_message': exc.message},
+                    to_player_only=True,
+                ),
+                check_triggers=False,
+            )
+            self.fire_events()
+
     def send_message_to_lobby_consumer(
         self, player: Player, event: channel_schemas.ChannelTypeEventMessage
     ):
@@ -14,6 +14,8 @@ app.autodiscover_tasks()
 @app.on_after_finalize.connect
 def setup_periodic_tasks(sender, **kwargs):
     from app.tasks import (
+        fire_battle_timers,
+        process_battle_stats,
         record_player_stats,
         sync_bods,
         update_global_statistics,
@@ -29,3 +31,7 @@ def setup_periodic_tasks(sender, **kwargs):
 
     # every 10 seconds
     sender.add_periodic_task(1 * 10, update_last_activity.s())
+    sender.add_periodic_task(1 * 10, process_battle_stats.s())
+
+    # every second, timers are late by up to a second
+    sender.add_periodic_task(1, fire_battle_timers.s())
@@ -719,6 +719,12 @@ GLOBAL_STATISTICS_DEFAULT_CACHE_TIME = 60
 PLAYER_STATISTICS_DEFAULT_CACHE_TIME = 60
 BATTLE_CARD_ID_CACHE_TIME = 60 * 60
 BATTLE_STATE_TTL = 60 * 60
+# 'msgpack' or legacy 'json', states in both formats are always readable
+BATTLE_STATE_CODEC = os.environ.get('BATTLE_STATE_CODEC', 'msgpack')
+# battle logs are written to mongo in batches by each websocket worker
+BATTLE_LOG_BATCH_SIZE = int(os.environ.get('BATTLE_LOG_BATCH_SIZE', 100))
+BATTLE_LOG_FLUSH_INTERVAL = float(os.environ.get('BATTLE_LOG_FLUSH_INTERVAL', 1))
+BATTLE_LOG_MAX_BUFFER_SIZE = int(os.environ.get('BATTLE_LOG_MAX_BUFFER_SIZE', 10000))
 
 SKILL_POINTS_ON_VICTORY = 2
 SKILL_POINTS_ON_LOSS = -1
@@ -752,6 +758,45 @@ BATTLE_CONSUMER_REDIS_GROUP_PREFIX = 'game-users'
 BATTLE_STATE_REDIS_PREFIX = 'game-state'
 BATTLE_RECONNECT_REDIS_PREFIX = 'reconnect_cache'
 REDIS_GROUP_PREFIX = 'game-'
+# sorted set of player_id -> timestamp of the last websocket message
+PLAYER_ACTIVITY_REDIS_KEY = 'player-activity'
+PLAYER_ACTIVITY_BATCH_SIZE = 1000
+# sorted sets of connected users by place, see PresenceRepository
+PRESENCE_REDIS_PREFIX = 'presence'
+PRESENCE_TTL = 60 * 60
+# lobby connections refresh their presence this often, so idle users don't expire
+PRESENCE_HEARTBEAT_INTERVAL = PRESENCE_TTL // 4
+# friend status changes are coalesced per recipient, see FriendStatusUpdatesRepository
+FRIEND_STATUS_UPDATES_REDIS_PREFIX = 'friend-status-updates'
+FRIEND_STATUS_UPDATES_TTL = 60
+# username -> player id lookups of the lobby handlers, see PlayerRepository.find_by_username
+PLAYER_USERNAME_REDIS_PREFIX = 'player-username'
+PLAYER_USERNAME_CACHE_TTL = 24 * 60 * 60
+PLAYER_USERNAME_CACHE_SIZE = 10000
+# lowercased WhitelistWallet addresses, see WhitelistRepository
+WHITELIST_WALLETS_REDIS_KEY = 'whitelist-wallets'
+WHITELIST_WALLETS_TTL = 24 * 60 * 60
+# ids of published cards that are not blocked, per game mode, see CardRepository.get_random_cards
+CARD_POOL_REDIS_PREFIX = 'card-pool'
+CARD_POOL_VERSION_REDIS_KEY = 'card-pool-version'
+CARD_POOL_TTL = 24 * 60 * 60
+# battle timers fired by the fire_battle_timers task, see BattleTimerRepository
+BATTLE_TIMERS_REDIS_KEY = 'battle-timers'
+BATTLE_TIMERS_PAYLOAD_REDIS_KEY = 'battle-timers-payload'
+BATTLE_TIMERS_BATCH_SIZE = 500
+BATTLE_TIMERS_STALE_FIRES_REDIS_KEY = 'battle-timers-stale-fires'
+# lifetime totals and per day counters of the global statistics, see StatisticsRepository
+STATISTICS_REDIS_PREFIX = 'statistics'
+STATISTICS_DAYS_TTL = 31 * 24 * 60 * 60
+# completed battles waiting for the process_battle_stats task, see BattleStatsQueueRepository
+BATTLE_STATS_QUEUE_REDIS_KEY = 'battle-stats-queue'
+BATTLE_STATS_BATCH_SIZE = 200
+# a batch not applied within this time is returned to the queue
+BATTLE_STATS_PROCESSING_TTL = 5 * 60
+# only one process_battle_stats run applies batches at a time
+BATTLE_STATS_LOCK_REDIS_KEY = 'battle-stats-lock'
+BATTLE_STATS_LOCK_TIMEOUT = 5 * 60
+PLAYER_STATISTICS_CACHE_TTL = 60 * 60
 
 DISABLE_PING = os.environ.get('DISABLE_PING', False)
 